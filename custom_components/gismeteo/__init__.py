@@ -8,35 +8,106 @@ https://github.com/Limych/ha-gismeteo/
 """
 
 import asyncio
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
 import logging
-from typing import Optional
-
-from aiohttp import ClientConnectorError
+import os
+import random
+import statistics
+import time
+from typing import Any, Deque, Dict, Optional
+import zlib
+
+from aiohttp import ClientError, ClientSession, TCPConnector, hdrs
 from async_timeout import timeout
 
-from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN
-from homeassistant.components.weather import DOMAIN as WEATHER_DOMAIN
 from homeassistant.config_entries import SOURCE_IMPORT, ConfigEntry
-from homeassistant.const import CONF_LATITUDE, CONF_LONGITUDE, CONF_MODE, CONF_PLATFORM
-from homeassistant.core import Config, HomeAssistant
-from homeassistant.exceptions import ConfigEntryNotReady
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.storage import STORAGE_DIR
+from homeassistant.const import (
+    CONF_LATITUDE,
+    CONF_LONGITUDE,
+    CONF_MODE,
+    CONF_PLATFORM,
+    EVENT_HOMEASSISTANT_CLOSE,
+    EVENT_HOMEASSISTANT_STOP,
+)
+from homeassistant.core import CALLBACK_TYPE, Config, Event, HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryNotReady, PlatformNotReady
+from homeassistant.helpers.aiohttp_client import (
+    SERVER_SOFTWARE,
+    async_get_clientsession,
+)
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.singleton import singleton
+from homeassistant.helpers.storage import STORAGE_DIR, Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-
-from .api import ApiError, GismeteoApiClient
+from homeassistant.util import dt as dt_util
+
+from .api import (
+    ApiError,
+    GismeteoApiClient,
+    GismeteoCircuitBreaker,
+    GismeteoConnectionStats,
+    GismeteoFetchBroker,
+)
+from .cache import TEMP_FILE_PREFIX, Cache, MemoryCache
 from .const import (
+    ATTR_LAST_UPDATED,
+    CACHE_CLEANUP_INTERVAL,
+    CACHE_FILE_PREFIXES,
+    CACHE_MAX_AGE,
+    CACHE_MAX_ENTRIES,
+    CACHE_MAX_SIZE,
+    CITIES_DUMP_FILE,
+    CONF_CACHE_COMPRESSION,
     CONF_CACHE_DIR,
+    CONF_CITY_INDEX,
+    CONF_DEDICATED_SESSION,
+    CONF_LOCATION_PRECISION,
+    CONF_PARSE_IN_PROCESS,
+    CONF_PARSE_THRESHOLD,
     CONF_PLATFORMS,
     CONF_YAML,
     COORDINATOR,
+    DATA_CACHE_JANITOR,
+    DATA_CIRCUIT_BREAKER,
+    DATA_CITY_INDEX,
+    DATA_CONNECTION_STATS,
+    DATA_FETCH_BROKER,
+    DATA_LOCATIONS,
+    DATA_MEMORY_CACHE,
+    DATA_PARSE_EXECUTOR,
+    DATA_SESSION,
+    DATA_YAML_COLLECTED,
+    DATA_YAML_UPDATED,
+    DEFAULT_CACHE_COMPRESSION,
     DOMAIN,
     FORECAST_MODE_HOURLY,
+    LOCATION_CACHE_PRECISION,
+    LOCATION_MAX_CACHE_INTERVAL,
+    LOCATIONS_SAVE_DELAY,
+    LOCATIONS_STORAGE_KEY,
+    LOCATIONS_STORAGE_VERSION,
+    PARSE_EXECUTOR_THRESHOLD,
+    PARSE_PROCESS_WORKERS,
     PLATFORMS,
+    SESSION_DNS_CACHE_TTL,
+    SESSION_KEEPALIVE_TIMEOUT,
+    SESSION_LIMIT_PER_HOST,
+    SETUP_CONCURRENCY,
     STARTUP_MESSAGE,
     UNDO_UPDATE_LISTENER,
+    UPDATE_HISTORY_SIZE,
     UPDATE_INTERVAL,
+    UPDATE_INTERVAL_MAX,
+    UPDATE_INTERVAL_MIN,
+    UPDATE_PUBLISH_DELAY,
+    UPDATE_SPREAD_WINDOW,
+    YAML_QUIET_PERIOD,
+    YAML_SETUP_TIMEOUT,
 )
+from .geo import CityIndex, read_cached_cities
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -56,25 +127,354 @@ async def async_setup(hass: HomeAssistant, config: Config) -> bool:
     return True
 
 
-def get_gismeteo(hass: HomeAssistant, config) -> GismeteoApiClient:
+@singleton(DATA_FETCH_BROKER)
+def async_get_fetch_broker(hass: HomeAssistant) -> GismeteoFetchBroker:
+    """Return fetch broker shared by all Gismeteo API clients."""
+    return GismeteoFetchBroker()
+
+
+@singleton(DATA_CIRCUIT_BREAKER)
+def async_get_circuit_breaker(hass: HomeAssistant) -> GismeteoCircuitBreaker:
+    """Return circuit breaker shared by all Gismeteo API clients."""
+    return GismeteoCircuitBreaker()
+
+
+@singleton(DATA_CITY_INDEX)
+async def async_get_city_index(hass: HomeAssistant) -> CityIndex:
+    """Return index of known cities shared by all Gismeteo API clients."""
+
+    def build_index() -> CityIndex:
+        index = CityIndex()
+        dump = hass.config.path(CITIES_DUMP_FILE)
+        if os.path.exists(dump):
+            index.load_dump(dump)
+        return index
+
+    return await hass.async_add_executor_job(build_index)
+
+
+async def async_get_location_index(hass: HomeAssistant, config) -> Optional[CityIndex]:
+    """Return city index to resolve location with, if it is enabled in config.
+
+    Cities from cached location responses in cache directory of config are
+    added to index on first use of the directory.
+    """
+    if not config.get(CONF_CITY_INDEX, False):
+        return None
+
+    index = await async_get_city_index(hass)
+    cache_dir = _cache_dir(hass, config)
+    if cache_dir not in index.cache_dirs:
+        index.cache_dirs.add(cache_dir)
+        # Files are read in executor, but index is changed in event loop only
+        index.add_many(await hass.async_add_executor_job(read_cached_cities, cache_dir))
+    return index
+
+
+@singleton(DATA_MEMORY_CACHE)
+def async_get_memory_cache(hass: HomeAssistant) -> MemoryCache:
+    """Return in-memory cache tier shared by all Gismeteo API clients."""
+    return MemoryCache(ttl=CACHE_MAX_AGE.total_seconds())
+
+
+class GismeteoCacheJanitor:
+    """Periodic housekeeping of cache directories.
+
+    Expired cache files are removed and size of each directory is bounded by
+    quota. Cleanup runs in executor.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        """Initialize."""
+        self._hass = hass
+        self._caches: Dict[str, Cache] = {}
+        self._unsub: Optional[CALLBACK_TYPE] = None
+        self.stats: Dict[str, int] = {
+            "runs": 0,
+            "entries": 0,
+            "size": 0,
+            "expired": 0,
+            "evicted": 0,
+            "freed": 0,
+        }
+
+    def add_dir(self, cache_dir: str) -> None:
+        """Add cache directory to housekeeping."""
+        if cache_dir not in self._caches:
+            self._caches[cache_dir] = Cache(
+                {
+                    "cache_dir": cache_dir,
+                    "memory_cache": async_get_memory_cache(self._hass),
+                }
+            )
+
+    @callback
+    def async_start(self) -> None:
+        """Start periodic cleanup."""
+        if self._unsub is None:
+            self._unsub = async_track_time_interval(
+                self._hass,
+                self.async_cleanup,
+                CACHE_CLEANUP_INTERVAL,
+                cancel_on_shutdown=True,
+            )
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop periodic cleanup."""
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+
+    async def async_cleanup(self, now: Optional[datetime] = None) -> None:
+        """Clean all cache directories."""
+        entries = size = 0
+        run_stats = {"expired": 0, "evicted": 0, "freed": 0}
+        for cache_dir, cache in list(self._caches.items()):
+            stats = await self._hass.async_add_executor_job(
+                partial(
+                    cache.cleanup,
+                    CACHE_MAX_AGE.total_seconds(),
+                    max_size=CACHE_MAX_SIZE,
+                    max_entries=CACHE_MAX_ENTRIES,
+                    prefixes=(*CACHE_FILE_PREFIXES, TEMP_FILE_PREFIX),
+                )
+            )
+            _LOGGER.debug("Cache directory %s cleaned: %s", cache_dir, stats)
+            entries += stats["entries"]
+            size += stats["size"]
+            for key in ("expired", "evicted", "freed"):
+                run_stats[key] += stats[key]
+                self.stats[key] += stats[key]
+
+        self.stats["runs"] += 1
+        self.stats["entries"] = entries
+        self.stats["size"] = size
+        _LOGGER.log(
+            logging.INFO if run_stats["freed"] else logging.DEBUG,
+            "Cache cleanup removed %d expired and %d evicted files (%d bytes), "
+            "%d files (%d bytes) kept",
+            run_stats["expired"],
+            run_stats["evicted"],
+            run_stats["freed"],
+            entries,
+            size,
+        )
+
+
+@singleton(DATA_CACHE_JANITOR)
+def async_get_cache_janitor(hass: HomeAssistant) -> GismeteoCacheJanitor:
+    """Return housekeeper of cache directories of all Gismeteo API clients."""
+    return GismeteoCacheJanitor(hass)
+
+
+@singleton(DATA_PARSE_EXECUTOR)
+def async_get_parse_executor(hass: HomeAssistant) -> Executor:
+    """Return process pool parsing large responses of all Gismeteo API clients.
+
+    Worker processes are started on first use.
+    """
+    executor = ProcessPoolExecutor(max_workers=PARSE_PROCESS_WORKERS)
+
+    async def async_shutdown(event: Event) -> None:
+        await hass.async_add_executor_job(executor.shutdown)
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_shutdown)
+    return executor
+
+
+@singleton(DATA_CONNECTION_STATS)
+def async_get_connection_stats(hass: HomeAssistant) -> GismeteoConnectionStats:
+    """Return statistics of connections of dedicated session."""
+    return GismeteoConnectionStats()
+
+
+@singleton(DATA_SESSION)
+def async_get_session(hass: HomeAssistant) -> ClientSession:
+    """Return HTTP session shared by all Gismeteo API clients.
+
+    Unlike shared session of Home Assistant, connections of this session are
+    not limited by requests of other integrations and are kept alive between
+    updates.
+    """
+    stats = async_get_connection_stats(hass)
+    session = ClientSession(
+        connector=TCPConnector(
+            limit_per_host=SESSION_LIMIT_PER_HOST,
+            keepalive_timeout=SESSION_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=SESSION_DNS_CACHE_TTL,
+        ),
+        headers={hdrs.USER_AGENT: SERVER_SOFTWARE},
+        trace_configs=[stats.trace_config()],
+    )
+
+    async def async_close(event: Event) -> None:
+        _LOGGER.debug("Connection statistics: %s", stats.stats)
+        await session.close()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, async_close)
+    return session
+
+
+@singleton(DATA_YAML_UPDATED)
+def async_get_yaml_updated(hass: HomeAssistant) -> asyncio.Event:
+    """Return event which is set when platform registers location from YAML."""
+    return asyncio.Event()
+
+
+@singleton(DATA_YAML_COLLECTED)
+def async_get_yaml_collected(hass: HomeAssistant) -> asyncio.Event:
+    """Return event which is set when config entry took locations from YAML."""
+    return asyncio.Event()
+
+
+async def async_register_yaml_location(
+    hass: HomeAssistant, uid: str, config: dict
+) -> Optional["GismeteoDataUpdateCoordinator"]:
+    """Register location from configuration.yaml.
+
+    Locations registered after config entry took them for setup are not added
+    to it, but set up right away. Their coordinator is returned, so platform
+    adds entities itself. Returns None for locations set up with config entry.
+    """
+    if CONF_YAML not in hass.data[DOMAIN]:
+        hass.data[DOMAIN].setdefault(CONF_YAML, {})
+        hass.async_create_task(
+            hass.config_entries.flow.async_init(
+                DOMAIN, context={"source": SOURCE_IMPORT}, data={}
+            )
+        )
+
+    if not async_get_yaml_collected(hass).is_set():
+        hass.data[DOMAIN][CONF_YAML][uid] = config
+        async_get_yaml_updated(hass).set()
+        return None
+
+    _LOGGER.debug("Setting up location %s registered after setup", uid)
+    try:
+        coordinator = await _async_get_coordinator(hass, uid, config)
+    except ConfigEntryNotReady as error:
+        raise PlatformNotReady from error
+
+    hass.data[DOMAIN][uid] = {
+        COORDINATOR: coordinator,
+    }
+    async_get_cache_janitor(hass).async_start()
+    return coordinator
+
+
+async def _async_wait_yaml_locations(hass: HomeAssistant) -> None:
+    """Wait until platforms register all locations from configuration.yaml.
+
+    Platforms are set up concurrently with config entry, so locations are
+    considered registered when no new ones arrive for quiet period.
+    """
+    updated = async_get_yaml_updated(hass)
+    deadline = hass.loop.time() + YAML_SETUP_TIMEOUT.total_seconds()
+    while True:
+        updated.clear()
+        wait_time = min(YAML_QUIET_PERIOD.total_seconds(), deadline - hass.loop.time())
+        if wait_time <= 0:
+            return
+        try:
+            async with timeout(wait_time):
+                await updated.wait()
+        except asyncio.TimeoutError:
+            return
+
+
+class GismeteoLocationStore:
+    """Storage of locations resolved on previous runs."""
+
+    def __init__(self, hass: HomeAssistant):
+        """Initialize."""
+        self._store = Store(hass, LOCATIONS_STORAGE_VERSION, LOCATIONS_STORAGE_KEY)
+        self._locations: Dict[str, Dict[str, Any]] = {}
+
+    async def async_load(self) -> None:
+        """Load stored locations."""
+        self._locations = await self._store.async_load() or {}
+
+    @staticmethod
+    def _key(latitude: float, longitude: float) -> str:
+        """Return key of location for coordinates."""
+        return f"{latitude},{longitude}"
+
+    def get(self, latitude: float, longitude: float) -> Optional[Dict[str, Any]]:
+        """Return location resolved for coordinates, if any."""
+        return self._locations.get(self._key(latitude, longitude))
+
+    @callback
+    def async_set(
+        self, latitude: float, longitude: float, location: Dict[str, Any]
+    ) -> None:
+        """Store location resolved for coordinates."""
+        self._locations[self._key(latitude, longitude)] = {
+            **location,
+            "updated": time.time(),
+        }
+        self._store.async_delay_save(lambda: self._locations, LOCATIONS_SAVE_DELAY)
+
+
+@singleton(DATA_LOCATIONS)
+async def async_get_location_store(hass: HomeAssistant) -> GismeteoLocationStore:
+    """Return storage of resolved locations."""
+    store = GismeteoLocationStore(hass)
+    await store.async_load()
+    return store
+
+
+def _cache_dir(hass: HomeAssistant, config) -> str:
+    """Return cache directory of location."""
+    return config.get(CONF_CACHE_DIR, hass.config.path(STORAGE_DIR))
+
+
+def get_gismeteo(
+    hass: HomeAssistant, config, city_index: Optional[CityIndex] = None
+) -> GismeteoApiClient:
     """Prepare Gismeteo instance."""
     return GismeteoApiClient(
-        async_get_clientsession(hass),
+        async_get_session(hass)
+        if config.get(CONF_DEDICATED_SESSION, False)
+        else async_get_clientsession(hass),
         latitude=config.get(CONF_LATITUDE, hass.config.latitude),
         longitude=config.get(CONF_LONGITUDE, hass.config.longitude),
         mode=config.get(CONF_MODE, FORECAST_MODE_HOURLY),
         params={
             "timezone": str(hass.config.time_zone),
-            "cache_dir": config.get(CONF_CACHE_DIR, hass.config.path(STORAGE_DIR)),
+            "cache_dir": _cache_dir(hass, config),
             "cache_time": UPDATE_INTERVAL.total_seconds(),
+            "cache_compression": config.get(
+                CONF_CACHE_COMPRESSION, DEFAULT_CACHE_COMPRESSION
+            ),
+            "cache_parsed": True,
+            "broker": async_get_fetch_broker(hass),
+            "circuit_breaker": async_get_circuit_breaker(hass),
+            "stale_while_revalidate": True,
+            # Background refreshes are cancelled on shutdown
+            "create_task": partial(
+                hass.async_create_background_task, name=f"{DOMAIN} revalidation"
+            ),
+            "memory_cache": async_get_memory_cache(hass),
+            "city_index": city_index,
+            "parse_threshold": config.get(
+                CONF_PARSE_THRESHOLD, PARSE_EXECUTOR_THRESHOLD
+            ),
+            "parse_executor": async_get_parse_executor(hass)
+            if config.get(CONF_PARSE_IN_PROCESS, False)
+            else None,
+            "location_precision": config.get(
+                CONF_LOCATION_PRECISION, LOCATION_CACHE_PRECISION
+            ),
         },
     )
 
 
 async def _async_get_coordinator(hass: HomeAssistant, unique_id, config: dict):
     """Prepare update coordinator instance."""
-    gismeteo = get_gismeteo(hass, config)
-    await gismeteo.async_get_location()
+    gismeteo = get_gismeteo(hass, config, await async_get_location_index(hass, config))
+    await _async_resolve_location(hass, gismeteo, config)
+    async_get_cache_janitor(hass).add_dir(_cache_dir(hass, config))
 
     coordinator = GismeteoDataUpdateCoordinator(hass, unique_id, gismeteo)
     await coordinator.async_refresh()
@@ -85,17 +485,58 @@ async def _async_get_coordinator(hass: HomeAssistant, unique_id, config: dict):
     return coordinator
 
 
+async def _async_resolve_location(
+    hass: HomeAssistant, gismeteo: GismeteoApiClient, config: dict
+) -> None:
+    """Resolve location of API client, reusing location from previous runs."""
+    store = await async_get_location_store(hass)
+    latitude, longitude = gismeteo.latitude, gismeteo.longitude
+
+    location = store.get(latitude, longitude)
+    if location is None:
+        await gismeteo.async_get_location()
+        store.async_set(latitude, longitude, gismeteo.location)
+        return
+
+    gismeteo.set_location(location)
+    if time.time() - location["updated"] > LOCATION_MAX_CACHE_INTERVAL.total_seconds():
+        hass.async_create_task(_async_update_location(hass, config))
+
+
+async def _async_update_location(hass: HomeAssistant, config: dict) -> None:
+    """Update stored location in background."""
+    store = await async_get_location_store(hass)
+    # Location is refreshed from API, as index may have only nearby cities
+    gismeteo = get_gismeteo(hass, config)
+    latitude, longitude = gismeteo.latitude, gismeteo.longitude
+    try:
+        await gismeteo.async_get_location()
+    except (ApiError, ClientError) as error:
+        _LOGGER.debug("Can't update location: %s", error)
+        return
+    store.async_set(latitude, longitude, gismeteo.location)
+
+
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
     """Set up Gismeteo as config entry."""
     if config_entry.source == SOURCE_IMPORT:
         # Setup from configuration.yaml
-        await asyncio.sleep(12)
+        await _async_wait_yaml_locations(hass)
+
+        # Platforms registering locations later set them up by themselves
+        async_get_yaml_collected(hass).set()
+        locations = list(hass.data[DOMAIN][CONF_YAML].items())
+        platforms = {cfg[CONF_PLATFORM] for _, cfg in locations}
+        semaphore = asyncio.Semaphore(SETUP_CONCURRENCY)
 
-        platforms = set()
+        async def async_get_coordinator(uid, cfg):
+            async with semaphore:
+                return await _async_get_coordinator(hass, uid, cfg)
 
-        for uid, cfg in hass.data[DOMAIN][CONF_YAML].items():
-            platforms.add(cfg[CONF_PLATFORM])
-            coordinator = await _async_get_coordinator(hass, uid, cfg)
+        coordinators = await asyncio.gather(
+            *(async_get_coordinator(uid, cfg) for uid, cfg in locations)
+        )
+        for (uid, _), coordinator in zip(locations, coordinators):
             hass.data[DOMAIN][uid] = {
                 COORDINATOR: coordinator,
             }
@@ -120,17 +561,20 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
             UNDO_UPDATE_LISTENER: undo_listener,
         }
 
+    hass.data[DOMAIN][config_entry.entry_id][CONF_PLATFORMS] = platforms
     for component in platforms:
         hass.async_create_task(
             hass.config_entries.async_forward_entry_setup(config_entry, component)
         )
 
+    async_get_cache_janitor(hass).async_start()
     return True
 
 
 async def async_unload_entry(hass: HomeAssistant, config_entry) -> bool:
     """Unload a config entry."""
-    platforms = config_entry.data.get(CONF_PLATFORMS, [SENSOR_DOMAIN, WEATHER_DOMAIN])
+    # Only platforms set up for entry can be unloaded
+    platforms = hass.data[DOMAIN][config_entry.entry_id][CONF_PLATFORMS]
 
     unload_ok = all(
         await asyncio.gather(
@@ -145,6 +589,17 @@ async def async_unload_entry(hass: HomeAssistant, config_entry) -> bool:
 
     if unload_ok:
         hass.data[DOMAIN].pop(config_entry.entry_id)
+        if config_entry.source == SOURCE_IMPORT:
+            for uid in hass.data[DOMAIN].get(CONF_YAML, {}):
+                hass.data[DOMAIN].pop(uid, None)
+
+        # Locations from YAML registered late stay set up by their platforms
+        if not any(
+            COORDINATOR in data
+            for key, data in hass.data[DOMAIN].items()
+            if key != CONF_YAML
+        ):
+            async_get_cache_janitor(hass).async_stop()
 
     return unload_ok
 
@@ -161,10 +616,24 @@ class GismeteoDataUpdateCoordinator(DataUpdateCoordinator):
         self, hass: HomeAssistant, unique_id: Optional[str], gismeteo: GismeteoApiClient
     ):
         """Initialize."""
-        super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=UPDATE_INTERVAL)
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=DOMAIN,
+            update_interval=UPDATE_INTERVAL,
+            always_update=False,
+        )
 
         self.gismeteo = gismeteo
         self._unique_id = unique_id
+        # Deterministic phase spreads polls of many entries over update interval
+        self._phase = (
+            zlib.crc32(unique_id.encode()) / 2**32
+            if unique_id is not None
+            else random.random()  # nosec
+        )
+        self._published: Optional[datetime] = None
+        self._publish_periods: Deque[float] = deque(maxlen=UPDATE_HISTORY_SIZE)
 
     @property
     def unique_id(self):
@@ -176,6 +645,77 @@ class GismeteoDataUpdateCoordinator(DataUpdateCoordinator):
         try:
             async with timeout(10):
                 await self.gismeteo.async_update()
-            return self.gismeteo.current
-        except (ApiError, ClientConnectorError) as error:
+        except (ApiError, ClientError, asyncio.TimeoutError) as error:
+            self._schedule_update(self._staggered_interval(UPDATE_INTERVAL))
             raise UpdateFailed(error) from error
+
+        for task in self.gismeteo.revalidations:
+            task.add_done_callback(self._async_revalidated)
+
+        self._schedule_update(self._next_update_interval())
+        # Listeners are notified only when returned revision changes
+        return self.gismeteo.revision
+
+    def _schedule_update(self, interval: timedelta) -> None:
+        """Set delay until next poll.
+
+        Cached data expires in half of the delay, so next poll does not get
+        data cached by previous one.
+        """
+        self.update_interval = interval
+        self.gismeteo.cache_time = interval.total_seconds() / 2
+
+    @callback
+    def _async_revalidated(self, task: asyncio.Task) -> None:
+        """Update data when stale cached data was refreshed in background."""
+        if not task.cancelled() and task.result():
+            self.hass.async_create_task(self.async_request_refresh())
+
+    def _next_update_interval(self) -> timedelta:
+        """Learn upstream publishing cadence and return delay until next poll.
+
+        Gismeteo publishes new data with its own period. The period is estimated
+        as median of observed changes of data timestamp and next poll is planned
+        shortly after next data is expected. Changes spanning several periods
+        (e.g. when publications were skipped) are divided by their multiple of
+        the shortest change.
+        """
+        published = dt_util.parse_datetime(
+            self.gismeteo.attributes.get(ATTR_LAST_UPDATED) or ""
+        )
+        if published is None:
+            return self._staggered_interval(UPDATE_INTERVAL)
+
+        if self._published is not None and published > self._published:
+            self._publish_periods.append((published - self._published).total_seconds())
+        if self._published is None or published > self._published:
+            self._published = published
+
+        if not self._publish_periods:
+            return self._staggered_interval(UPDATE_INTERVAL)
+
+        shortest = min(self._publish_periods)
+        period = timedelta(
+            seconds=statistics.median_low(
+                [x / max(1, round(x / shortest)) for x in self._publish_periods]
+            )
+        )
+        interval = self._published + period + UPDATE_PUBLISH_DELAY - dt_util.utcnow()
+        # Phase spreads polls of many entries shortly after expected publication
+        interval += min(period, UPDATE_SPREAD_WINDOW) * self._phase
+        _LOGGER.debug(
+            "Estimated upstream period: %s, next poll in %s", period, interval
+        )
+        return max(UPDATE_INTERVAL_MIN, min(interval, UPDATE_INTERVAL_MAX))
+
+    def _staggered_interval(self, interval: timedelta) -> timedelta:
+        """Return delay until next poll slot of this coordinator.
+
+        Slots are spaced by interval and shifted by coordinator phase, so
+        coordinators of different entries do not poll at the same moments.
+        """
+        period = interval.total_seconds()
+        delay = (self._phase * period - dt_util.utcnow().timestamp()) % period
+        if delay < period / 2:
+            delay += period
+        return timedelta(seconds=delay)
@@ -7,16 +7,25 @@ For more details about this platform, please refer to the documentation at
 https://github.com/Limych/ha-gismeteo/
 """
 
-from collections.abc import Callable
+import asyncio
+import bisect
+from collections.abc import Awaitable, Callable, Coroutine, Hashable
+from concurrent.futures import Executor
 from datetime import datetime
+from email.utils import parsedate_to_datetime
+import hashlib
 from http import HTTPStatus
+import json
 import logging
 import math
+import pickle
+import random
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
 import xml.etree.ElementTree as etree  # type: ignore
 
-from aiohttp import ClientSession
+from aiohttp import ClientError, ClientSession, TraceConfig, hdrs
+from yarl import URL
 
 from homeassistant.components.weather import (
     ATTR_CONDITION_CLEAR_NIGHT,
@@ -45,7 +54,13 @@ from homeassistant.components.weather import (
     ATTR_WEATHER_WIND_BEARING,
     ATTR_WEATHER_WIND_SPEED,
 )
-from homeassistant.const import ATTR_ID, ATTR_NAME, STATE_UNKNOWN
+from homeassistant.const import (
+    ATTR_ID,
+    ATTR_LATITUDE,
+    ATTR_LONGITUDE,
+    ATTR_NAME,
+    STATE_UNKNOWN,
+)
 from homeassistant.util import dt as dt_util
 
 from .cache import Cache
@@ -75,13 +90,42 @@ from .const import (
     FORECAST_MAX_CACHE_INTERVAL,
     FORECAST_MODE_DAILY,
     FORECAST_MODE_HOURLY,
+    LOCATION_CACHE_PRECISION,
     LOCATION_MAX_CACHE_INTERVAL,
     MMHG2HPA,
     MS2KMH,
+    PARSE_EXECUTOR_THRESHOLD,
+    PRECIPITATION_AMOUNT,
 )
+from .forecast_table import ForecastTable, batch_conditions
+from .geo import CityIndex, geohash_neighbors
 
 _LOGGER = logging.getLogger(__name__)
 
+CHUNK_SIZE = 4096
+
+# Version of parsed data format stored to cache
+PARSED_CACHE_VERSION = 3
+
+# Retries of failed requests. Retry delays must fit into time budget, so
+# whole update fits into timeout of coordinator
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.5
+RETRY_BUDGET = 5.0
+# Number of cities updated simultaneously by multi-city client
+MULTI_CLIENT_CONCURRENCY = 8
+
+RETRY_STATUSES = frozenset(
+    {
+        HTTPStatus.REQUEST_TIMEOUT,
+        HTTPStatus.TOO_MANY_REQUESTS,
+        HTTPStatus.INTERNAL_SERVER_ERROR,
+        HTTPStatus.BAD_GATEWAY,
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        HTTPStatus.GATEWAY_TIMEOUT,
+    }
+)
+
 
 class InvalidCoordinatesError(Exception):
     """Raised when coordinates are invalid."""
@@ -101,6 +145,191 @@ class ApiError(Exception):
         self.status = status
 
 
+class GismeteoFetchBroker:
+    """Share in-flight forecast requests between API clients.
+
+    Concurrent updates for the same key await a single request and receive
+    the same parsed result. Background refreshes of stale cached data are
+    shared the same way, so every client of the key can watch for them.
+    """
+
+    def __init__(self):
+        """Initialize."""
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._revalidations: Dict[Hashable, asyncio.Task] = {}
+
+    async def async_fetch(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Return result of fetch, joining in-flight request for key if any."""
+        task = self._pending.get(key)
+        if task is None:
+            _LOGGER.debug("Starting shared request for %s", key)
+            task = asyncio.ensure_future(fetch())
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        else:
+            _LOGGER.debug("Joining in-flight request for %s", key)
+
+        # Cancelling one waiter (e.g. by timeout) must not cancel the others
+        return await asyncio.shield(task)
+
+    def get_revalidation(self, key: Hashable) -> Optional[asyncio.Task]:
+        """Return pending background refresh of data for key if any."""
+        return self._revalidations.get(key)
+
+    def add_revalidation(self, key: Hashable, task: asyncio.Task) -> None:
+        """Register background refresh of data for key."""
+        self._revalidations[key] = task
+
+        def done(_):
+            if self._revalidations.get(key) is task:
+                del self._revalidations[key]
+
+        task.add_done_callback(done)
+
+
+class GismeteoCircuitBreaker:
+    """Suspend requests to failing hosts.
+
+    After several consecutive failed requests to a host, further requests to it
+    are not made for a while and callers fall back to cached data. Then one
+    trial request is let through to check if the host is back.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60):
+        """Initialize."""
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures: Dict[Optional[str], int] = {}
+        self._open_until: Dict[Optional[str], float] = {}
+
+    def is_open(self, host: Optional[str]) -> bool:
+        """Return True if requests to host are suspended."""
+        open_until = self._open_until.get(host)
+        return open_until is not None and time.monotonic() < open_until
+
+    def allow_request(self, host: Optional[str]) -> bool:
+        """Return True if request to host can be made."""
+        if host not in self._open_until:
+            return True
+        if self.is_open(host):
+            return False
+
+        # Let one trial request through and hold others until it is finished
+        self._open_until[host] = time.monotonic() + self._reset_timeout
+        return True
+
+    def record_success(self, host: Optional[str]) -> None:
+        """Register successful request to host."""
+        self._failures.pop(host, None)
+        if self._open_until.pop(host, None) is not None:
+            _LOGGER.info("Requests to %s are resumed", host)
+
+    def record_failure(
+        self, host: Optional[str], retry_after: Optional[float] = None
+    ) -> None:
+        """Register failed request to host."""
+        self._failures[host] = self._failures.get(host, 0) + 1
+        if self._failures[host] < self._failure_threshold and retry_after is None:
+            return
+
+        timeout = max(self._reset_timeout, retry_after or 0)
+        if host not in self._open_until:
+            _LOGGER.warning(
+                "Requests to %s are failing, suspending them for %d seconds",
+                host,
+                timeout,
+            )
+        self._open_until[host] = time.monotonic() + timeout
+
+
+class GismeteoConnectionStats:
+    """Statistics of connections of HTTP session.
+
+    Counters are collected by session trace config.
+    """
+
+    def __init__(self):
+        """Initialize."""
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return counters."""
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+        }
+
+    def trace_config(self) -> TraceConfig:
+        """Return trace config which collects statistics of session."""
+
+        def counter(name: str):
+            async def increment(*_):
+                setattr(self, name, getattr(self, name) + 1)
+
+            return increment
+
+        trace_config = TraceConfig()
+        trace_config.on_request_start.append(counter("requests"))
+        trace_config.on_connection_create_end.append(counter("connections_created"))
+        trace_config.on_connection_reuseconn.append(counter("connections_reused"))
+        trace_config.on_dns_cache_hit.append(counter("dns_cache_hits"))
+        trace_config.on_dns_cache_miss.append(counter("dns_cache_misses"))
+        return trace_config
+
+
+class GismeteoCurrentWeather:
+    """Immutable set of values derived from current weather data.
+
+    Condition is not included, as it depends on time of day.
+    """
+
+    __slots__ = (
+        "temperature",
+        "temperature_feels_like",
+        "water_temperature",
+        "pressure_mmhg",
+        "pressure_hpa",
+        "humidity",
+        "wind_bearing",
+        "wind_speed_kmh",
+        "wind_speed_ms",
+        "precipitation_amount",
+        "clouds",
+        "rain",
+        "snow",
+        "storm",
+        "geomagnetic",
+    )
+
+    def __init__(self, **kwargs):
+        """Initialize."""
+        for key in self.__slots__:
+            object.__setattr__(self, key, kwargs.get(key))
+
+    def __setattr__(self, key, value):
+        """Prevent modification of values."""
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, key):
+        """Prevent deletion of values."""
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __repr__(self) -> str:
+        """Return representation of values."""
+        values = ", ".join(f"{x}={getattr(self, x)!r}" for x in self.__slots__)
+        return f"{self.__class__.__name__}({values})"
+
+
 class GismeteoApiClient:
     """Gismeteo API implementation."""
 
@@ -126,6 +355,27 @@ class GismeteoApiClient:
         self._session = session
         self._mode = mode
         self._cache = Cache(params) if params.get("cache_dir") is not None else None
+        self._cache_parsed = self._cache is not None and params.get(
+            "cache_parsed", False
+        )
+        self._broker: Optional[GismeteoFetchBroker] = params.get("broker")
+        self._circuit_breaker: Optional[GismeteoCircuitBreaker] = params.get(
+            "circuit_breaker"
+        )
+        self._stale_while_revalidate = params.get("stale_while_revalidate", False)
+        self._city_index: Optional[CityIndex] = params.get("city_index")
+        self._location_precision = params.get(
+            "location_precision", LOCATION_CACHE_PRECISION
+        )
+        self._revalidations: Dict[str, asyncio.Task] = {}
+        self._create_task: Callable[[Coroutine], asyncio.Task] = params.get(
+            "create_task", asyncio.ensure_future
+        )
+        self._forecast_url: Optional[str] = None
+        # Modification times of cached data last returned by _async_get_data
+        self._data_mtimes: Dict[str, float] = {}
+        self._parse_threshold = params.get("parse_threshold", PARSE_EXECUTOR_THRESHOLD)
+        self._parse_executor: Optional[Executor] = params.get("parse_executor")
         self._latitude = latitude
         self._longitude = longitude
         self._attributes: Dict[str, Any] = {
@@ -134,7 +384,13 @@ class GismeteoApiClient:
 
         self._last_updated = None
         self._current = {}
-        self._forecast = []
+        # Forecast tables, times and memoized views by forecast mode
+        self._forecasts: Dict[str, ForecastTable] = {}
+        self._forecast_times: Dict[str, List[float]] = {}
+        self._forecast_cache: Dict[str, Tuple[int, List[Dict[str, Any]]]] = {}
+        self._snapshot: Optional[GismeteoCurrentWeather] = None
+        self._parsed: Optional[Dict[str, Any]] = None
+        self._data_hash: Optional[str] = None
         self._timezone = (
             dt_util.get_time_zone(params.get("timezone"))
             if params.get("timezone") is not None
@@ -163,6 +419,46 @@ class GismeteoApiClient:
         """Return current weather data."""
         return self._current
 
+    @property
+    def snapshot(self) -> Optional["GismeteoCurrentWeather"]:
+        """Return values derived from current weather data."""
+        return self._snapshot
+
+    @property
+    def revision(self) -> Hashable:
+        """Return token which changes only when exposed weather data changes.
+
+        Besides data itself, it changes when current forecast item changes and
+        at sunrise and sunset, as current condition depends on time of day.
+        """
+        now = int(time.time())
+        sunrise = self._current.get(ATTR_SUNRISE)
+        sunset = self._current.get(ATTR_SUNSET)
+        return (
+            self._data_hash,
+            tuple(
+                bisect.bisect_left(times, now)
+                for times in self._forecast_times.values()
+            ),
+            sunrise is not None
+            and sunset is not None
+            and self._is_day(now, sunrise, sunset),
+        )
+
+    @property
+    def revalidations(self) -> List[asyncio.Task]:
+        """Return pending background refreshes of cached data.
+
+        Result of each task is True if cached data was changed. Refreshes
+        started by other clients sharing the fetch broker are included.
+        """
+        tasks = list(self._revalidations.values())
+        if self._broker is not None and self._forecast_url is not None:
+            task = self._broker.get_revalidation(self._forecast_url)
+            if task is not None and task not in tasks:
+                tasks.append(task)
+        return tasks
+
     @property
     def latitude(self):
         """Return weather station latitude."""
@@ -179,64 +475,467 @@ class GismeteoApiClient:
         return self._attributes
 
     async def _async_get_data(
-        self, url: str, cache_fname=None, max_cache_time=0
+        self,
+        url: str,
+        cache_fname=None,
+        max_cache_time=0,
+        parser: Optional["GismeteoForecastParser"] = None,
     ) -> str:
-        """Retreive data from Gismeteo API and cache results."""
+        """Retreive data from Gismeteo API and cache results.
+
+        If parser is passed, response is fed to it chunk by chunk as it arrives.
+        Responses larger than parse threshold are not fed to parser and should be
+        parsed by caller.
+        """
         _LOGGER.debug("Requesting URL %s", url)
 
         data = None
         data_cached = None
         data_is_cached = False
+        touched = None
+        cache_age = None
+        headers = {}
+        validators = {}
+        validators_fname = None
+        mtime_key = cache_fname
 
         if self._cache and cache_fname is not None:
+            validators_fname = cache_fname + ".validators"
             cache_fname += ".xml"
-            data_cached = self._cache.read_cache(cache_fname, max_cache_time)
-            data_is_cached = self._cache.is_cached(cache_fname)
+            data_cached, cache_age = await self._cache.async_read_cache_entry(
+                cache_fname, max_cache_time
+            )
+            data_is_cached = self._cache.is_fresh(cache_age)
 
-        if not data_is_cached:
-            async with self._session.get(url) as resp:
-                if resp.status != HTTPStatus.OK:
-                    _LOGGER.error("Invalid response from Gismeteo API: %s", resp.status)
-                else:
-                    _LOGGER.debug(
-                        "Data retrieved from %s, status: %s", url, resp.status
+            if data_cached and not data_is_cached:
+                validators = await self._async_read_validators(
+                    validators_fname, max_cache_time
+                )
+                if validators.get(hdrs.ETAG):
+                    headers[hdrs.IF_NONE_MATCH] = validators[hdrs.ETAG]
+                if validators.get(hdrs.LAST_MODIFIED):
+                    headers[hdrs.IF_MODIFIED_SINCE] = validators[hdrs.LAST_MODIFIED]
+
+        if data_cached and not data_is_cached and self._stale_while_revalidate:
+            if cache_fname not in self._revalidations and (
+                self._broker is None or self._broker.get_revalidation(url) is None
+            ):
+                _LOGGER.debug("Refreshing stale cached data in background")
+                task = self._create_task(
+                    self._async_revalidate(
+                        url, cache_fname, validators_fname, validators, headers
                     )
-                    data = await resp.text()
+                )
+                self._revalidations[cache_fname] = task
+                task.add_done_callback(
+                    lambda _, key=cache_fname: self._revalidations.pop(key, None)
+                )
+                if self._broker is not None:
+                    self._broker.add_revalidation(url, task)
+        elif not data_is_cached:
+            data, touched = await self._async_refresh_data(
+                url,
+                cache_fname,
+                validators_fname,
+                validators,
+                headers,
+                parser,
+                fallback=bool(data_cached),
+            )
 
+        data_mtime = None
         if not data and data_cached:
             _LOGGER.debug("Cached response used")
             data = data_cached
+            if touched is not None:
+                data_mtime = touched
+            elif data_is_cached:
+                data_mtime = time.time() - cache_age
         elif self._cache and cache_fname is not None and data:
-            self._cache.save_cache(cache_fname, data)
+            data_mtime = await self._cache.async_save_cache(cache_fname, data)
 
+        if mtime_key is not None:
+            if data_mtime is None:
+                self._data_mtimes.pop(mtime_key, None)
+            else:
+                self._data_mtimes[mtime_key] = data_mtime
         return data
 
+    async def _async_refresh_data(
+        self,
+        url: str,
+        cache_fname: Optional[str],
+        validators_fname: Optional[str],
+        validators: Dict[str, str],
+        headers: Dict[str, str],
+        parser: Optional["GismeteoForecastParser"] = None,
+        fallback: bool = False,
+    ) -> Tuple[Optional[str], Optional[float]]:
+        """Request data from API.
+
+        If fallback is True, caller has cached data to use if request fails.
+        Returns data and new modification time of cached data, if server
+        confirmed that cached data is not modified. Data is None if it is not
+        available or not changed since it was cached.
+        """
+        host = URL(url).host
+        if self._circuit_breaker is not None and not (
+            self._circuit_breaker.allow_request(host)
+        ):
+            if not fallback:
+                raise ApiError(f"Requests to {host} are suspended")
+            _LOGGER.debug("Requests to %s are suspended", host)
+            return None, None
+
+        status, data, resp_headers = await self._async_request_with_retries(
+            url, headers, parser, fallback
+        )
+        if status == HTTPStatus.NOT_MODIFIED and fallback:
+            _LOGGER.debug("Data not modified since last request to %s", url)
+            return None, await self._cache.async_touch(cache_fname)
+        if status is None:
+            _LOGGER.error("Gismeteo API is not available")
+        elif status != HTTPStatus.OK:
+            _LOGGER.error("Invalid response from Gismeteo API: %s", status)
+        elif self._cache and cache_fname is not None:
+            await self._async_save_validators(
+                validators_fname, validators, resp_headers
+            )
+        return data, None
+
+    async def _async_revalidate(
+        self,
+        url: str,
+        cache_fname: str,
+        validators_fname: str,
+        validators: Dict[str, str],
+        headers: Dict[str, str],
+    ) -> bool:
+        """Refresh cached data in background.
+
+        Returns True if cached data was changed.
+        """
+        try:
+            data, _ = await self._async_refresh_data(
+                url, cache_fname, validators_fname, validators, headers, fallback=True
+            )
+        except (ApiError, ClientError, asyncio.TimeoutError) as error:
+            _LOGGER.warning("Refresh of cached data failed: %s", error)
+            return False
+
+        if not data:
+            return False
+        await self._cache.async_save_cache(cache_fname, data)
+        return True
+
+    async def _async_request_with_retries(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        parser: Optional["GismeteoForecastParser"] = None,
+        fallback: bool = False,
+    ) -> Tuple[Optional[int], Optional[str], Mapping[str, str]]:
+        """Make request to API, retrying it on transient errors.
+
+        Retries are delayed with exponential backoff and jitter or as server
+        asks by Retry-After header. If fallback is True, connection errors are
+        not raised, as caller has cached data to use instead.
+        """
+        host = URL(url).host
+        deadline = time.monotonic() + RETRY_BUDGET
+        attempt = 0
+        while True:
+            attempt += 1
+            error: Optional[Exception] = None
+            retry_after = None
+            try:
+                status, data, resp_headers = await self._async_request(
+                    url, headers, parser
+                )
+            except (ClientError, asyncio.TimeoutError) as ex:
+                error = ex
+                status, data, resp_headers = None, None, {}
+            else:
+                if status not in RETRY_STATUSES:
+                    if self._circuit_breaker is not None:
+                        self._circuit_breaker.record_success(host)
+                    return status, data, resp_headers
+                retry_after = self._retry_after(resp_headers)
+
+            if parser is not None:
+                # Data of failed attempt can be partially fed to parser
+                parser.discard()
+
+            if retry_after is not None:
+                delay = retry_after
+            else:
+                backoff = RETRY_BACKOFF * 2 ** (attempt - 1)
+                delay = backoff / 2 + random.uniform(0, backoff / 2)  # nosec
+
+            if attempt >= RETRY_ATTEMPTS or time.monotonic() + delay > deadline:
+                if self._circuit_breaker is not None:
+                    self._circuit_breaker.record_failure(host, retry_after)
+                if error is not None and not fallback:
+                    raise error
+                return status, data, resp_headers
+
+            _LOGGER.debug(
+                "Request to %s failed (%s), retrying in %.1f seconds",
+                url,
+                error or status,
+                delay,
+            )
+            await asyncio.sleep(delay)
+
+    async def _async_request(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        parser: Optional["GismeteoForecastParser"] = None,
+    ) -> Tuple[int, Optional[str], Mapping[str, str]]:
+        """Make single request to API and return status, body and headers.
+
+        Accept-Encoding header is set by aiohttp, so compressed responses
+        (including Brotli, when it is available) are decompressed transparently.
+        """
+        async with self._session.get(url, headers=headers) as resp:
+            if resp.status != HTTPStatus.OK:
+                return resp.status, None, resp.headers
+
+            _LOGGER.debug("Data retrieved from %s, status: %s", url, resp.status)
+            if parser is None:
+                return resp.status, await resp.text(), resp.headers
+
+            chunks = []
+            size = 0
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                chunks.append(chunk)
+                size += len(chunk)
+                if parser is None:
+                    continue
+                if size > self._parse_threshold:
+                    # Too big to parse on event loop
+                    parser.discard()
+                    parser = None
+                else:
+                    parser.feed(chunk)
+            # Encoding can't be guessed from body, as it was read as stream
+            data = b"".join(chunks).decode(resp.charset or "utf-8")
+            return resp.status, data, resp.headers
+
+    @staticmethod
+    def _retry_after(headers: Mapping[str, str]) -> Optional[float]:
+        """Return delay requested by Retry-After header, if any."""
+        value = headers.get(hdrs.RETRY_AFTER)
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    async def _async_read_validators(
+        self, cache_fname: str, max_cache_time=0
+    ) -> Dict[str, str]:
+        """Read HTTP cache validators of cached data."""
+        data, _ = await self._cache.async_read_cache_entry(cache_fname, max_cache_time)
+        try:
+            validators = json.loads(data) if data else {}
+        except ValueError:
+            return {}
+        return validators if isinstance(validators, dict) else {}
+
+    async def _async_save_validators(
+        self, cache_fname: str, validators: Dict[str, str], resp_headers
+    ) -> None:
+        """Save HTTP cache validators of response."""
+        new_validators = {
+            x: resp_headers[x]
+            for x in (hdrs.ETAG, hdrs.LAST_MODIFIED)
+            if isinstance(resp_headers.get(x), str)
+        }
+        if new_validators and new_validators != validators:
+            await self._cache.async_save_cache(cache_fname, json.dumps(new_validators))
+
     async def async_get_location(self):
         """Retreive location data from Gismeteo."""
         url = (
             ENDPOINT_URL
             + f"/cities/?lat={self._latitude}&lng={self._longitude}&count=1&lang=en"
         )
-        cache_fname = f"location_{self._latitude}_{self._longitude}"
+        # Nearby coordinates share the same cached location
+        cells = geohash_neighbors(
+            self._latitude, self._longitude, self._location_precision
+        )
+        cache_fname = f"location_{cells[0]}"
+
+        location = None
+        if self._city_index is not None:
+            location = self._city_index.nearest(self._latitude, self._longitude)
+            if location is not None:
+                _LOGGER.debug("Location found in city index")
+        if location is None and self._cache is not None:
+            for cell in cells:
+                location = await self._async_read_cached_location(f"location_{cell}")
+                if location is not None:
+                    break
+        if location is None:
+            response = await self._async_get_data(
+                url, cache_fname, LOCATION_MAX_CACHE_INTERVAL.total_seconds()
+            )
+            location = self._parse_location(response)
 
-        response = await self._async_get_data(
-            url, cache_fname, LOCATION_MAX_CACHE_INTERVAL.total_seconds()
+            await self._async_save_parsed(
+                cache_fname,
+                location,
+                self._data_mtimes.get(cache_fname),
+                LOCATION_MAX_CACHE_INTERVAL.total_seconds(),
+            )
+            if self._city_index is not None:
+                self._city_index.add(location)
+
+        self.set_location(location)
+
+    async def _async_read_cached_location(
+        self, cache_fname: str
+    ) -> Optional[Dict[str, Any]]:
+        """Return location from cache without requesting API.
+
+        Location is used while it is younger than maximum cache interval.
+        Location parsed from cached response is saved to cache of parsed data.
+        """
+        max_cache_time = LOCATION_MAX_CACHE_INTERVAL.total_seconds()
+        location = await self._async_read_parsed(cache_fname, max_cache_time)
+        if location is not None:
+            return location
+
+        response, age = await self._cache.async_read_cache_entry(
+            cache_fname + ".xml", max_cache_time
         )
+        if not response:
+            return None
+        try:
+            location = self._parse_location(response)
+        except ApiError:
+            return None
+
+        await self._async_save_parsed(
+            cache_fname, location, time.time() - age, max_cache_time
+        )
+        return location
+
+    def _parse_location(self, response: str) -> Dict[str, Any]:
+        """Parse location data from API response."""
         try:
             xml = etree.fromstring(response)
             item = xml.find("item")
             lon = self._get(item, "lng", float)
-            self._attributes = {
+            return {
                 ATTR_ID: self._get(item, "id", int),
                 ATTR_NAME: self._get(item, "n"),
+                ATTR_LATITUDE: self._get(item, "lat", float),
+                ATTR_LONGITUDE: (lon - 360) if lon > 180 else lon,
             }
-            self._latitude = self._get(item, "lat", float)
-            self._longitude = (lon - 360) if lon > 180 else lon
         except (etree.ParseError, TypeError, AttributeError) as ex:
             raise ApiError(
                 "Can't retrieve location data! Invalid server response."
             ) from ex
 
+    @property
+    def cache_time(self) -> Optional[float]:
+        """Return time while cached data is fresh."""
+        return self._cache.cache_time if self._cache is not None else None
+
+    @cache_time.setter
+    def cache_time(self, value: float) -> None:
+        """Set time while cached data is fresh."""
+        if self._cache is not None:
+            self._cache.cache_time = value
+
+    @property
+    def location(self) -> Dict[str, Any]:
+        """Return location data."""
+        return {
+            ATTR_ID: self._attributes.get(ATTR_ID),
+            ATTR_NAME: self._attributes.get(ATTR_NAME),
+            ATTR_LATITUDE: self._latitude,
+            ATTR_LONGITUDE: self._longitude,
+        }
+
+    def set_location(self, location: Dict[str, Any]) -> None:
+        """Use location data retrieved earlier."""
+        self._attributes = {
+            ATTR_ID: location[ATTR_ID],
+            ATTR_NAME: location[ATTR_NAME],
+        }
+        self._latitude = location[ATTR_LATITUDE]
+        self._longitude = location[ATTR_LONGITUDE]
+
+    async def _async_read_parsed(
+        self, cache_fname: str, max_cache_time: float = 0
+    ) -> Optional[Any]:
+        """Read parsed data from cache if it is not expired.
+
+        Data expires after cache time of client or max_cache_time, whichever
+        is longer.
+        """
+        if not self._cache_parsed:
+            return None
+
+        data, _ = await self._cache.async_read_cache_entry(
+            cache_fname + ".parsed", max_cache_time, binary=True
+        )
+        if data is None:
+            return None
+
+        try:
+            version, parsed = pickle.loads(data)  # nosec
+        except (
+            pickle.UnpicklingError,
+            AttributeError,
+            EOFError,
+            ImportError,
+            IndexError,
+            TypeError,
+            ValueError,
+        ):
+            _LOGGER.debug("Invalid parsed data in cache: %s", cache_fname)
+            return None
+
+        if version != PARSED_CACHE_VERSION:
+            return None
+
+        _LOGGER.debug("Cached parsed data used")
+        return parsed
+
+    async def _async_save_parsed(
+        self,
+        cache_fname: str,
+        parsed: Any,
+        mtime: Optional[float],
+        max_cache_time: float = 0,
+    ) -> None:
+        """Save parsed data to cache.
+
+        Parsed data expires together with source data modified at mtime. So it
+        is saved only if source data is not expired.
+        """
+        if not self._cache_parsed or mtime is None:
+            return
+
+        if not self._cache.is_fresh(time.time() - mtime, max_cache_time):
+            return
+
+        await self._cache.async_save_cache(
+            cache_fname + ".parsed",
+            pickle.dumps((PARSED_CACHE_VERSION, parsed), protocol=5),
+            mtime,
+        )
+
     @staticmethod
     def _get(var: dict, ind: str, func: Optional[Callable] = None) -> Any:
         res = var.get(ind)
@@ -307,12 +1006,16 @@ class GismeteoApiClient:
 
     def temperature(self, src=None):
         """Return the current temperature."""
+        if not src and self._snapshot is not None:
+            return self._snapshot.temperature
         src = src or self._current
         temperature = src.get(ATTR_WEATHER_TEMPERATURE)
         return float(temperature) if temperature is not None else STATE_UNKNOWN
 
     def temperature_feels_like(self, src=None):
         """Return the current temperature feeling."""
+        if not src and self._snapshot is not None:
+            return self._snapshot.temperature_feels_like
         temp = self.temperature(src)
         humi = self.humidity(src)
         wind = self.wind_speed_ms(src)
@@ -325,59 +1028,129 @@ class GismeteoApiClient:
 
     def water_temperature(self, src=None):
         """Return the current temperature of water."""
+        if not src and self._snapshot is not None:
+            return self._snapshot.water_temperature
         src = src or self._current
         temperature = src.get(ATTR_WEATHER_WATER_TEMPERATURE)
         return float(temperature) if temperature is not None else STATE_UNKNOWN
 
     def pressure_mmhg(self, src=None):
         """Return the current pressure in mmHg."""
+        if not src and self._snapshot is not None:
+            return self._snapshot.pressure_mmhg
         src = src or self._current
         pressure = src.get(ATTR_WEATHER_PRESSURE)
         return float(pressure) if pressure is not None else STATE_UNKNOWN
 
     def pressure_hpa(self, src=None):
         """Return the current pressure in hPa."""
+        if not src and self._snapshot is not None:
+            return self._snapshot.pressure_hpa
         src = src or self._current
         pressure = src.get(ATTR_WEATHER_PRESSURE)
         return round(pressure * MMHG2HPA, 1) if pressure is not None else STATE_UNKNOWN
 
     def humidity(self, src=None):
         """Return the name of the sensor."""
+        if not src and self._snapshot is not None:
+            return self._snapshot.humidity
         src = src or self._current
         humidity = src.get(ATTR_WEATHER_HUMIDITY)
         return int(humidity) if humidity is not None else STATE_UNKNOWN
 
     def wind_bearing(self, src=None):
         """Return the current wind bearing."""
+        if not src and self._snapshot is not None:
+            return self._snapshot.wind_bearing
         src = src or self._current
         bearing = int(src.get(ATTR_WEATHER_WIND_BEARING, 0))
         return (bearing - 1) * 45 if bearing > 0 else STATE_UNKNOWN
 
     def wind_speed_kmh(self, src=None):
         """Return the current windspeed in km/h."""
+        if not src and self._snapshot is not None:
+            return self._snapshot.wind_speed_kmh
         src = src or self._current
         speed = src.get(ATTR_WEATHER_WIND_SPEED)
         return round(speed * MS2KMH, 1) if speed is not None else STATE_UNKNOWN
 
     def wind_speed_ms(self, src=None):
         """Return the current windspeed in m/s."""
+        if not src and self._snapshot is not None:
+            return self._snapshot.wind_speed_ms
         src = src or self._current
         speed = src.get(ATTR_WEATHER_WIND_SPEED)
         return float(speed) if speed is not None else STATE_UNKNOWN
 
     def precipitation_amount(self, src=None):
         """Return the current precipitation amount in mm."""
+        if not src and self._snapshot is not None:
+            return self._snapshot.precipitation_amount
         src = src or self._current
         precipitation = src.get(ATTR_WEATHER_PRECIPITATION_AMOUNT)
         return precipitation if precipitation is not None else STATE_UNKNOWN
 
-    def forecast(self, src=None):
-        """Return the forecast array."""
-        src = src or self._forecast
-        forecast = []
+    def _make_snapshot(self, src: Dict[str, Any]) -> "GismeteoCurrentWeather":
+        """Derive all current weather values from source data."""
+        cloudiness = src.get(ATTR_WEATHER_CLOUDINESS)
+        pr_type = src.get(ATTR_WEATHER_PRECIPITATION_TYPE)
+        pr_amount = src.get(ATTR_WEATHER_PRECIPITATION_AMOUNT)
+        pr_int = src.get(ATTR_WEATHER_PRECIPITATION_INTENSITY)
+        try:
+            precipitation = pr_amount or PRECIPITATION_AMOUNT[pr_int]
+        except (IndexError, TypeError):
+            precipitation = None
+
+        return GismeteoCurrentWeather(
+            temperature=self.temperature(src),
+            temperature_feels_like=self.temperature_feels_like(src),
+            water_temperature=self.water_temperature(src),
+            pressure_mmhg=self.pressure_mmhg(src),
+            pressure_hpa=self.pressure_hpa(src),
+            humidity=self.humidity(src),
+            wind_bearing=self.wind_bearing(src),
+            wind_speed_kmh=self.wind_speed_kmh(src),
+            wind_speed_ms=self.wind_speed_ms(src),
+            precipitation_amount=self.precipitation_amount(src),
+            clouds=int(cloudiness * 100 / 3) if cloudiness is not None else None,
+            rain=precipitation if pr_type in [1, 3] else 0,
+            snow=precipitation if pr_type in [2, 3] else 0,
+            storm=src.get(ATTR_WEATHER_STORM),
+            geomagnetic=src.get(ATTR_WEATHER_GEOMAGNETIC_FIELD),
+        )
+
+    def forecast(self, src=None, mode: Optional[str] = None):
+        """Return the forecast array.
+
+        Mode selects hourly or daily forecast. By default mode of client is used.
+        """
         now = int(time.time())
+        mode = mode or self._mode
+        if src:
+            return self._build_forecast(src, now, mode)
+
+        # Result changes only when data is updated or some forecast becomes past
+        bucket = bisect.bisect_left(self._forecast_times.get(mode, []), now)
+        cached = self._forecast_cache.get(mode)
+        if cached is None or cached[0] != bucket:
+            cached = self._forecast_cache[mode] = (
+                bucket,
+                self._build_forecast(
+                    self._forecasts.get(mode, ForecastTable()), now, mode
+                ),
+            )
+        return cached[1]
+
+    def _build_forecast(self, src, now: int, mode: str):
+        """Convert forecast data to Home Assistant format."""
+        forecast = []
+        conditions = (
+            batch_conditions(src, mode == FORECAST_MODE_DAILY)
+            if isinstance(src, ForecastTable)
+            else None
+        )
         dt_util.set_default_time_zone(self._timezone)
-        for i in src:
+        for idx, i in enumerate(src):
             fc_time = i.get(ATTR_FORECAST_TIME)
             if fc_time is None:
                 continue
@@ -386,7 +1159,9 @@ class GismeteoApiClient:
                 ATTR_FORECAST_TIME: dt_util.as_local(
                     datetime.utcfromtimestamp(fc_time)
                 ).isoformat(),
-                ATTR_FORECAST_CONDITION: self.condition(i),
+                ATTR_FORECAST_CONDITION: (
+                    conditions[idx] if conditions is not None else self.condition(i)
+                ),
                 ATTR_FORECAST_TEMP: self.temperature(i),
                 ATTR_FORECAST_PRESSURE: self.pressure_hpa(i),
                 ATTR_FORECAST_HUMIDITY: self.humidity(i),
@@ -396,7 +1171,7 @@ class GismeteoApiClient:
             }
 
             if (
-                self._mode == FORECAST_MODE_DAILY
+                mode == FORECAST_MODE_DAILY
                 and i.get(ATTR_FORECAST_TEMP_LOW) is not None
             ):
                 data[ATTR_FORECAST_TEMP_LOW] = i.get(ATTR_FORECAST_TEMP_LOW)
@@ -423,111 +1198,344 @@ class GismeteoApiClient:
             await self.async_get_location()
 
         url = f"{ENDPOINT_URL}/forecast/?city={self.attributes[ATTR_ID]}&lang=en"
+        self._forecast_url = url
+
+        async def fetch():
+            return await self._async_fetch_forecast(url)
+
+        if self._broker is not None:
+            # URL identifies both the city and the language of response
+            parsed = await self._broker.async_fetch(url, fetch)
+        else:
+            parsed = await fetch()
+
+        self._attributes[ATTR_LAST_UPDATED] = parsed[ATTR_LAST_UPDATED]
+        if parsed is self._parsed or (
+            parsed.get("hash") is not None and parsed["hash"] == self._data_hash
+        ):
+            _LOGGER.debug("Forecast data not changed")
+            return True
+
+        self._parsed = parsed
+        self._data_hash = parsed.get("hash")
+        if parsed["current"] is not self._current:
+            self._current = parsed["current"]
+            self._snapshot = self._make_snapshot(self._current)
+        if parsed["forecast"] is not self._forecasts:
+            self._forecasts = parsed["forecast"]
+            self._forecast_times = {
+                mode: sorted(
+                    i[ATTR_FORECAST_TIME]
+                    for i in table
+                    if i.get(ATTR_FORECAST_TIME) is not None
+                )
+                for mode, table in self._forecasts.items()
+            }
+            self._forecast_cache = {}
+        return True
+
+    async def _async_fetch_forecast(self, url: str) -> Dict[str, Any]:
+        """Retreive and parse forecast data."""
         cache_fname = f"forecast_{self.attributes[ATTR_ID]}"
 
+        parsed = await self._async_read_parsed(cache_fname)
+        if parsed is None:
+            parsed = await self._async_parse_forecast(url, cache_fname)
+            await self._async_save_parsed(
+                cache_fname, parsed, self._data_mtimes.get(cache_fname)
+            )
+        return parsed
+
+    async def _async_parse_forecast(self, url: str, cache_fname: str):
+        """Retreive forecast data and parse it.
+
+        Known data is detected early while streaming and by hash of response,
+        so it is not parsed again.
+        """
+        parser = GismeteoForecastParser(
+            self._parsed[ATTR_LAST_UPDATED] if self._parsed is not None else None
+        )
+
         response = await self._async_get_data(
-            url, cache_fname, FORECAST_MAX_CACHE_INTERVAL.total_seconds()
+            url, cache_fname, FORECAST_MAX_CACHE_INTERVAL.total_seconds(), parser
         )
-        try:
-            xml = etree.fromstring(response)
-            tzone = int(xml.find("location").get("tzone"))
-            self._attributes[ATTR_LAST_UPDATED] = (
-                dt_util.as_local(
-                    dt_util.utc_from_timestamp(
-                        self._get_utime(xml.find("location").get("cur_time"), tzone)
-                    )
-                )
-                .replace(microsecond=0)
-                .isoformat()
+        data_hash = (
+            hashlib.blake2b(response.encode(), digest_size=16).hexdigest()
+            if response is not None
+            else None
+        )
+        if (
+            data_hash is not None
+            and data_hash == self._data_hash
+            and self._parsed is not None
+        ):
+            # Same payload as before, so parsing it again gives nothing new
+            return self._parsed
+
+        if parser.fed and not parser.skipped:
+            parsed = parser.close()
+        elif response is not None and len(response) > self._parse_threshold:
+            # Data was not streamed from network (e.g. was taken from cache)
+            _LOGGER.debug("Parsing forecast data in executor")
+            parsed = await asyncio.get_running_loop().run_in_executor(
+                self._parse_executor, parse_forecast, response
             )
-            current = xml.find("location/fact")
-            current_v = current.find("values")
-
-            self._current = {
-                ATTR_SUNRISE: self._get(current, "sunrise", int),
-                ATTR_SUNSET: self._get(current, "sunset", int),
-                ATTR_WEATHER_CONDITION: self._get(current_v, "descr"),
-                ATTR_WEATHER_TEMPERATURE: self._get(current_v, "tflt", float),
-                ATTR_WEATHER_PRESSURE: self._get(current_v, "p", int),
-                ATTR_WEATHER_HUMIDITY: self._get(current_v, "hum", int),
-                ATTR_WEATHER_WIND_SPEED: self._get(current_v, "ws", int),
-                ATTR_WEATHER_WIND_BEARING: self._get(current_v, "wd", int),
-                ATTR_WEATHER_CLOUDINESS: self._get(current_v, "cl", int),
-                ATTR_WEATHER_PRECIPITATION_TYPE: self._get(current_v, "pt", int),
-                ATTR_WEATHER_PRECIPITATION_AMOUNT: self._get(current_v, "prflt", float),
-                ATTR_WEATHER_PRECIPITATION_INTENSITY: self._get(current_v, "pr", int),
-                ATTR_WEATHER_STORM: (self._get(current_v, "ts") == 1),
-                ATTR_WEATHER_GEOMAGNETIC_FIELD: self._get(current_v, "grade", int),
-                ATTR_WEATHER_PHENOMENON: self._get(current_v, "ph", int),
-                ATTR_WEATHER_WATER_TEMPERATURE: self._get(current_v, "water_t", float),
-            }
+        else:
+            parsed = parse_forecast(response)
 
-            self._forecast = []
-            if self._mode == FORECAST_MODE_HOURLY:
-                for day in xml.findall("location/day"):
-                    sunrise = self._get(day, "sunrise", int)
-                    sunset = self._get(day, "sunset", int)
-
-                    for i in day.findall("forecast"):
-                        fc_v = i.find("values")
-                        data = {
-                            ATTR_SUNRISE: sunrise,
-                            ATTR_SUNSET: sunset,
-                            ATTR_FORECAST_TIME: self._get_utime(i.get("valid"), tzone),
-                            ATTR_FORECAST_CONDITION: self._get(fc_v, "descr"),
-                            ATTR_FORECAST_TEMP: self._get(fc_v, "t", int),
-                            ATTR_FORECAST_PRESSURE: self._get(fc_v, "p", int),
-                            ATTR_FORECAST_HUMIDITY: self._get(fc_v, "hum", int),
-                            ATTR_FORECAST_WIND_SPEED: self._get(fc_v, "ws", int),
-                            ATTR_FORECAST_WIND_BEARING: self._get(fc_v, "wd", int),
-                            ATTR_FORECAST_CLOUDINESS: self._get(fc_v, "cl", int),
-                            ATTR_FORECAST_PRECIPITATION_TYPE: self._get(
-                                fc_v, "pt", int
-                            ),
-                            ATTR_FORECAST_PRECIPITATION_AMOUNT: self._get(
-                                fc_v, "prflt", float
-                            ),
-                            ATTR_FORECAST_PRECIPITATION_INTENSITY: self._get(
-                                fc_v, "pr", int
-                            ),
-                            ATTR_FORECAST_STORM: (fc_v.get("ts") == 1),
-                            ATTR_FORECAST_GEOMAGNETIC_FIELD: self._get(
-                                fc_v, "grade", int
-                            ),
-                        }
-                        self._forecast.append(data)
-
-            else:  # self._mode == FORECAST_MODE_DAILY
-                for day in xml.findall("location/day[@descr]"):
-                    data = {
-                        ATTR_SUNRISE: self._get(day, "sunrise", int),
-                        ATTR_SUNSET: self._get(day, "sunset", int),
-                        ATTR_FORECAST_TIME: self._get_utime(day.get("date"), tzone),
-                        ATTR_FORECAST_CONDITION: self._get(day, "descr"),
-                        ATTR_FORECAST_TEMP: self._get(day, "tmax", int),
-                        ATTR_FORECAST_TEMP_LOW: self._get(day, "tmin", int),
-                        ATTR_FORECAST_PRESSURE: self._get(day, "p", int),
-                        ATTR_FORECAST_HUMIDITY: self._get(day, "hum", int),
-                        ATTR_FORECAST_WIND_SPEED: self._get(day, "ws", int),
-                        ATTR_FORECAST_WIND_BEARING: self._get(day, "wd", int),
-                        ATTR_FORECAST_CLOUDINESS: self._get(day, "cl", int),
-                        ATTR_FORECAST_PRECIPITATION_TYPE: self._get(day, "pt", int),
-                        ATTR_FORECAST_PRECIPITATION_AMOUNT: self._get(
-                            day, "prflt", float
-                        ),
-                        ATTR_FORECAST_PRECIPITATION_INTENSITY: self._get(
-                            day, "pr", int
-                        ),
-                        ATTR_FORECAST_STORM: (self._get(day, "ts") == 1),
-                        ATTR_FORECAST_GEOMAGNETIC_FIELD: self._get(
-                            day, "grademax", int
-                        ),
-                    }
-                    self._forecast.append(data)
+        parsed["hash"] = data_hash
+        return parsed
 
-            return True
 
+class GismeteoMultiClient:
+    """Retrieve forecasts of many cities at once.
+
+    Cities are updated concurrently over one session, limited by concurrency.
+    All responses are parsed in parse executor. Clients of cities are kept
+    between updates, so unchanged data is not parsed again.
+    """
+
+    def __init__(
+        self,
+        session: ClientSession,
+        mode=FORECAST_MODE_HOURLY,
+        params: Optional[dict] = None,
+        concurrency: int = MULTI_CLIENT_CONCURRENCY,
+    ):
+        """Initialize."""
+        self._session = session
+        self._mode = mode
+        self._params = {"parse_threshold": 0, **(params or {})}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._clients: Dict[int, GismeteoApiClient] = {}
+
+    def client(self, city_id: int) -> GismeteoApiClient:
+        """Return API client of city."""
+        client = self._clients.get(city_id)
+        if client is None:
+            client = self._clients[city_id] = GismeteoApiClient(
+                self._session,
+                location_key=city_id,
+                mode=self._mode,
+                params=self._params,
+            )
+        return client
+
+    async def async_update_many(
+        self, city_ids: Iterable[int]
+    ) -> Dict[int, Union[GismeteoApiClient, Exception]]:
+        """Update forecasts of cities.
+
+        Returns updated API client or error of update for each city.
+        """
+        city_ids = list(dict.fromkeys(city_ids))
+
+        async def async_update(city_id: int) -> GismeteoApiClient:
+            async with self._semaphore:
+                client = self.client(city_id)
+                await client.async_update()
+                return client
+
+        results = await asyncio.gather(
+            *(async_update(x) for x in city_ids), return_exceptions=True
+        )
+        return dict(zip(city_ids, results))
+
+
+def parse_forecast(response: str) -> Dict[str, Any]:
+    """Parse whole Gismeteo forecast response.
+
+    Suitable to run in thread or process pool executor.
+    """
+    parser = GismeteoForecastParser()
+    parser.feed(response)
+    return parser.close()
+
+
+class GismeteoForecastParser:
+    """Incremental parser of Gismeteo forecast response.
+
+    Data can be fed in chunks as they arrive from network. Forecast values are
+    extracted as soon as the element is complete and parsed elements are
+    cleared to keep memory usage flat. Both hourly and daily forecasts are
+    extracted in one pass.
+
+    If data was last updated at known_updated, it is considered already known
+    and parsing is skipped after location element.
+    """
+
+    def __init__(self, known_updated: Optional[str] = None):
+        """Initialize."""
+        self._known_updated = known_updated
+        self.discard()
+
+    def discard(self) -> None:
+        """Drop all data fed to parser."""
+        # pylint: disable=attribute-defined-outside-init
+        self._parser = etree.XMLPullParser(events=("start", "end"))
+        self._error: Optional[Exception] = None
+        self._tzone: Optional[int] = None
+        self._day: Optional[Dict[str, Any]] = None
+        self._last_updated = None
+        self._current = None
+        self._forecasts = {
+            FORECAST_MODE_HOURLY: ForecastTable(),
+            FORECAST_MODE_DAILY: ForecastTable(),
+        }
+        self.fed = False
+        self.skipped = False
+
+    def feed(self, data) -> None:
+        """Feed next chunk of data to parser."""
+        if self._error is not None or self.skipped:
+            return
+
+        if data:
+            self.fed = True
+        try:
+            self._parser.feed(data)
+            self._process_events()
         except (etree.ParseError, TypeError, AttributeError) as ex:
+            self._error = ex
+
+    def close(self) -> Dict[str, Any]:
+        """Finish parsing and return parsed data."""
+        if self._error is None:
+            try:
+                self._parser.close()
+                self._process_events()
+            except (etree.ParseError, TypeError, AttributeError) as ex:
+                self._error = ex
+
+        if self._error is None and (
+            self._last_updated is None or self._current is None
+        ):
+            self._error = AttributeError("Required elements not found")
+
+        if self._error is not None:
             raise ApiError(
                 "Can't update weather data! Invalid server response."
-            ) from ex
+            ) from self._error
+
+        return {
+            ATTR_LAST_UPDATED: self._last_updated,
+            "current": self._current,
+            "forecast": self._forecasts,
+        }
+
+    def _process_events(self) -> None:
+        """Process parsed elements."""
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                if elem.tag == "location":
+                    self._start_location(elem)
+                    if (
+                        self._known_updated is not None
+                        and self._last_updated == self._known_updated
+                    ):
+                        self.skipped = True
+                        return
+                elif elem.tag == "day":
+                    self._day = {
+                        ATTR_SUNRISE: GismeteoApiClient._get(elem, "sunrise", int),
+                        ATTR_SUNSET: GismeteoApiClient._get(elem, "sunset", int),
+                    }
+
+            elif elem.tag == "fact":
+                self._current = self._parse_fact(elem)
+                elem.clear()
+            elif elem.tag == "forecast":
+                self._forecasts[FORECAST_MODE_HOURLY].append(self._parse_hourly(elem))
+                elem.clear()
+            elif elem.tag == "day":
+                if elem.get("descr") is not None:
+                    self._forecasts[FORECAST_MODE_DAILY].append(self._parse_daily(elem))
+                elem.clear()
+
+    def _start_location(self, location) -> None:
+        """Process location element attributes."""
+        self._tzone = int(location.get("tzone"))
+        self._last_updated = (
+            dt_util.as_local(
+                dt_util.utc_from_timestamp(
+                    GismeteoApiClient._get_utime(location.get("cur_time"), self._tzone)
+                )
+            )
+            .replace(microsecond=0)
+            .isoformat()
+        )
+
+    @staticmethod
+    def _parse_fact(fact) -> Dict[str, Any]:
+        """Parse current weather data."""
+        get = GismeteoApiClient._get
+        current_v = fact.find("values")
+
+        return {
+            ATTR_SUNRISE: get(fact, "sunrise", int),
+            ATTR_SUNSET: get(fact, "sunset", int),
+            ATTR_WEATHER_CONDITION: get(current_v, "descr"),
+            ATTR_WEATHER_TEMPERATURE: get(current_v, "tflt", float),
+            ATTR_WEATHER_PRESSURE: get(current_v, "p", int),
+            ATTR_WEATHER_HUMIDITY: get(current_v, "hum", int),
+            ATTR_WEATHER_WIND_SPEED: get(current_v, "ws", int),
+            ATTR_WEATHER_WIND_BEARING: get(current_v, "wd", int),
+            ATTR_WEATHER_CLOUDINESS: get(current_v, "cl", int),
+            ATTR_WEATHER_PRECIPITATION_TYPE: get(current_v, "pt", int),
+            ATTR_WEATHER_PRECIPITATION_AMOUNT: get(current_v, "prflt", float),
+            ATTR_WEATHER_PRECIPITATION_INTENSITY: get(current_v, "pr", int),
+            ATTR_WEATHER_STORM: (get(current_v, "ts") == 1),
+            ATTR_WEATHER_GEOMAGNETIC_FIELD: get(current_v, "grade", int),
+            ATTR_WEATHER_PHENOMENON: get(current_v, "ph", int),
+            ATTR_WEATHER_WATER_TEMPERATURE: get(current_v, "water_t", float),
+        }
+
+    def _parse_hourly(self, elem) -> Dict[str, Any]:
+        """Parse hourly forecast data."""
+        get = GismeteoApiClient._get
+        fc_v = elem.find("values")
+
+        return {
+            ATTR_SUNRISE: self._day[ATTR_SUNRISE],
+            ATTR_SUNSET: self._day[ATTR_SUNSET],
+            ATTR_FORECAST_TIME: GismeteoApiClient._get_utime(
+                elem.get("valid"), self._tzone
+            ),
+            ATTR_FORECAST_CONDITION: get(fc_v, "descr"),
+            ATTR_FORECAST_TEMP: get(fc_v, "t", int),
+            ATTR_FORECAST_PRESSURE: get(fc_v, "p", int),
+            ATTR_FORECAST_HUMIDITY: get(fc_v, "hum", int),
+            ATTR_FORECAST_WIND_SPEED: get(fc_v, "ws", int),
+            ATTR_FORECAST_WIND_BEARING: get(fc_v, "wd", int),
+            ATTR_FORECAST_CLOUDINESS: get(fc_v, "cl", int),
+            ATTR_FORECAST_PRECIPITATION_TYPE: get(fc_v, "pt", int),
+            ATTR_FORECAST_PRECIPITATION_AMOUNT: get(fc_v, "prflt", float),
+            ATTR_FORECAST_PRECIPITATION_INTENSITY: get(fc_v, "pr", int),
+            ATTR_FORECAST_STORM: (fc_v.get("ts") == 1),
+            ATTR_FORECAST_GEOMAGNETIC_FIELD: get(fc_v, "grade", int),
+        }
+
+    def _parse_daily(self, day) -> Dict[str, Any]:
+        """Parse daily forecast data."""
+        get = GismeteoApiClient._get
+
+        return {
+            ATTR_SUNRISE: get(day, "sunrise", int),
+            ATTR_SUNSET: get(day, "sunset", int),
+            ATTR_FORECAST_TIME: GismeteoApiClient._get_utime(
+                day.get("date"), self._tzone
+            ),
+            ATTR_FORECAST_CONDITION: get(day, "descr"),
+            ATTR_FORECAST_TEMP: get(day, "tmax", int),
+            ATTR_FORECAST_TEMP_LOW: get(day, "tmin", int),
+            ATTR_FORECAST_PRESSURE: get(day, "p", int),
+            ATTR_FORECAST_HUMIDITY: get(day, "hum", int),
+            ATTR_FORECAST_WIND_SPEED: get(day, "ws", int),
+            ATTR_FORECAST_WIND_BEARING: get(day, "wd", int),
+            ATTR_FORECAST_CLOUDINESS: get(day, "cl", int),
+            ATTR_FORECAST_PRECIPITATION_TYPE: get(day, "pt", int),
+            ATTR_FORECAST_PRECIPITATION_AMOUNT: get(day, "prflt", float),
+            ATTR_FORECAST_PRECIPITATION_INTENSITY: get(day, "pr", int),
+            ATTR_FORECAST_STORM: (get(day, "ts") == 1),
+            ATTR_FORECAST_GEOMAGNETIC_FIELD: get(day, "grademax", int),
+        }
@@ -1,16 +1,171 @@
 #  Copyright (c) 2018, Vladimir Maksimenko <vl.maksime@gmail.com>
 #  Copyright (c) 2019-2022, Andrey "Limych" Khrolenok <andrey@khrolenok.ru>
 #
-# Version 3.1.0
+# Version 3.5.0
 """Cache controller."""
 
+import asyncio
+from collections import OrderedDict
+from contextlib import suppress
+import gzip
 import logging
 import os
+import tempfile
+import threading
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Optional, Tuple
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
 
 _LOGGER = logging.getLogger(__name__)
 
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+
+# Smaller content is stored uncompressed, as compression would not reduce it
+COMPRESS_MIN_SIZE = 256
+
+# Prefix of temporary files, which are left in cache directory after crash
+TEMP_FILE_PREFIX = ".tmp_"
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def compress(data: bytes, method: Optional[str]) -> bytes:
+    """Compress data by given method."""
+    if method == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if method == COMPRESSION_GZIP:
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    return data
+
+
+def decompress(data: bytes) -> bytes:
+    """Decompress data.
+
+    Compression method is detected by magic number, so uncompressed data is
+    returned as is. Raises ValueError if data is corrupted.
+    """
+    if data.startswith(_GZIP_MAGIC):
+        try:
+            return gzip.decompress(data)
+        except (EOFError, OSError, zlib.error) as ex:
+            raise ValueError(str(ex)) from ex
+    if data.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            raise ValueError("Zstandard compression is not supported")
+        try:
+            return zstandard.ZstdDecompressor().decompress(data)
+        except zstandard.ZstdError as ex:
+            raise ValueError(str(ex)) from ex
+    return data
+
+
+def read_file(file_path: str, binary: bool = False) -> Any:
+    """Read content of cache file."""
+    with open(file_path, "rb") as fp:
+        content = decompress(fp.read())
+    return content if binary else content.decode("utf-8")
+
+
+class MemoryCache:
+    """Bounded in-memory LRU storage of cached data.
+
+    Can be shared by several Cache instances. Entries are keyed by file path.
+    Entries expire after ttl seconds since modification, if ttl is set.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 64,
+        max_size: int = 4 * 1024 * 1024,
+        ttl: Optional[float] = None,
+    ):
+        """Initialize memory cache."""
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: OrderedDict[str, Tuple[Any, float]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return memory cache statistics."""
+        return {
+            "entries": len(self._entries),
+            "size": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def get(self, key: str, max_age: float) -> Optional[Tuple[Any, float]]:
+        """Return cached content and its modification time.
+
+        Entries older than max_age are not returned. They are kept for callers
+        accepting older data unless their own TTL is expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            age = time.time() - entry[1]
+            if self._ttl is not None and age >= self._ttl:
+                self._remove(key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            if age >= max_age:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, content: Any, mtime: float) -> None:
+        """Store content to memory cache."""
+        size = len(content)
+        with self._lock:
+            self._remove(key)
+            if size > self._max_size:
+                return
+
+            self._entries[key] = (content, mtime)
+            self._size += size
+            while len(self._entries) > self._max_entries or self._size > self._max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def touch(self, key: str, mtime: float) -> None:
+        """Update modification time of cached content."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], mtime)
+
+    def discard(self, key: str) -> None:
+        """Remove content from memory cache."""
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        """Remove entry without locking."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+
 
 class Cache:
     """Data caching class."""
@@ -19,34 +174,112 @@ class Cache:
         """Initialize cache."""
         _LOGGER.debug("Initializing cache")
         params = params or {}
+        if params.get("clean_dir"):
+            raise ValueError(
+                "clean_dir is not supported, run cleanup() in executor instead"
+            )
 
         self._cache_dir = params.get("cache_dir", "")
         self._cache_time = params.get("cache_time", 0)
         self._domain = params.get("domain")
+        self._memory: Optional[MemoryCache] = params.get("memory_cache")
+        self._compression = params.get("cache_compression")
+
+        if self._compression == COMPRESSION_ZSTD and zstandard is None:
+            _LOGGER.warning(
+                "Zstandard compression is not available, gzip is used instead"
+            )
+            self._compression = COMPRESSION_GZIP
 
         if self._cache_dir:
             self._cache_dir = os.path.abspath(self._cache_dir)
 
-        if params.get("clean_dir", False):
-            self._clean_dir()
+    def cleanup(
+        self,
+        cache_time: int = 0,
+        max_size: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        prefixes: Optional[Iterable[str]] = None,
+    ) -> Dict[str, int]:
+        """Remove expired cache files and bound size of cache directory.
 
-    def _clean_dir(self, cache_time: int = 0) -> None:
-        """Clean cache."""
+        Only files with names starting with one of prefixes are handled, if
+        prefixes are passed. Files exceeding quota are evicted in least recently
+        used order. Time of last use is the latest of access and modification
+        times of file. Returns cleanup statistics.
+
+        Cleanup is blocking, so it should be run in executor.
+        """
+        stats = {"entries": 0, "size": 0, "expired": 0, "evicted": 0, "freed": 0}
+        if not self._cache_dir:
+            return stats
+
+        if prefixes is not None:
+            prefixes = tuple(self._get_file_path(x) for x in prefixes)
         now_time = time.time()
         cache_time = max(cache_time, self._cache_time)
 
-        if self._cache_dir and os.path.exists(self._cache_dir):
-            _LOGGER.debug("Cleaning cache directory %s", self._cache_dir)
-            files = os.listdir(self._cache_dir)
-            _LOGGER.debug(files)
-            for file_name in files:
-                file_path = os.path.join(self._cache_dir, file_name)
-                try:
-                    file_time = os.path.getmtime(file_path)
-                    if (file_time + cache_time) <= now_time:
-                        os.remove(file_path)
-                except FileNotFoundError:  # pragma: no cover
-                    pass
+        _LOGGER.debug("Cleaning cache directory %s", self._cache_dir)
+        files = []
+        try:
+            with os.scandir(self._cache_dir) as entries:
+                for entry in entries:
+                    if prefixes is not None and not entry.path.startswith(prefixes):
+                        continue
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        stat = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:  # pragma: no cover
+                        continue
+                    files.append(
+                        (
+                            max(stat.st_atime, stat.st_mtime),
+                            stat.st_mtime,
+                            stat.st_size,
+                            entry.path,
+                        )
+                    )
+        except (FileNotFoundError, NotADirectoryError):
+            return stats
+
+        files.sort()
+        size = sum(x[2] for x in files)
+        count = len(files)
+        temp_prefix = self._get_file_path(TEMP_FILE_PREFIX)
+        for _, mtime, file_size, file_path in files:
+            expired = (mtime + cache_time) <= now_time
+            if not expired and file_path.startswith(temp_prefix):
+                continue  # File can be written right now
+            if (
+                not expired
+                and (max_size is None or size <= max_size)
+                and (max_entries is None or count <= max_entries)
+            ):
+                continue
+
+            with suppress(FileNotFoundError):
+                os.remove(file_path)
+                stats["expired" if expired else "evicted"] += 1
+                stats["freed"] += file_size
+            if self._memory is not None:
+                self._memory.discard(file_path)
+            size -= file_size
+            count -= 1
+
+        stats["entries"] = count
+        stats["size"] = size
+        return stats
+
+    @property
+    def cache_time(self) -> float:
+        """Return time while cached data is fresh."""
+        return self._cache_time
+
+    @cache_time.setter
+    def cache_time(self, value: float) -> None:
+        """Set time while cached data is fresh."""
+        self._cache_time = value
 
     def _get_file_path(self, file_name: str) -> str:
         """Get path of cache file."""
@@ -73,24 +306,155 @@ class Cache:
         cache_time = max(cache_time, self._cache_time)
         return (file_time + cache_time) > time.time()
 
-    def read_cache(self, file_name: str, cache_time: int = 0) -> Optional[Any]:
-        """Read cached data."""
+    def is_fresh(self, age: Optional[float], cache_time: int = 0) -> bool:
+        """Return True if cache entry of given age is not expired."""
+        return age is not None and age < max(cache_time, self._cache_time)
+
+    def read_cache_entry(
+        self, file_name: str, cache_time: int = 0, binary: bool = False
+    ) -> Tuple[Optional[Any], Optional[float]]:
+        """Read cached data and its age.
+
+        Data is returned only if it is not expired. Age is None if cache file is
+        not exists.
+        """
         file_path = self._get_file_path(file_name)
+        entry = self._read_memory(file_path, cache_time)
+        if entry is not None:
+            return entry
+
+        return self._read_file_entry(file_path, cache_time, binary)
+
+    def _read_file_entry(
+        self, file_path: str, cache_time: int = 0, binary: bool = False
+    ) -> Tuple[Optional[Any], Optional[float]]:
+        """Read cached data and its age from file.
+
+        Content is decompressed only if it is not expired.
+        """
         _LOGGER.debug("Read cache file %s", file_path)
-        if not self.is_cached(file_name, cache_time):
+        try:
+            with open(file_path, "rb") as fp:
+                mtime = os.fstat(fp.fileno()).st_mtime
+                age = time.time() - mtime
+                if not self.is_fresh(age, cache_time):
+                    return None, age
+                content = fp.read()
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            return None, None
+
+        try:
+            content = decompress(content)
+            if not binary:
+                content = content.decode("utf-8")
+        except ValueError as ex:
+            _LOGGER.debug("Invalid cache file %s: %s", file_path, ex)
+            return None, None
+
+        if self._memory is not None:
+            self._memory.put(file_path, content, mtime)
+        return content, age
+
+    def _read_memory(
+        self, file_path: str, cache_time: int = 0
+    ) -> Optional[Tuple[Any, float]]:
+        """Read cached data and its age from memory cache."""
+        if self._memory is None:
+            return None
+
+        entry = self._memory.get(file_path, max(cache_time, self._cache_time))
+        if entry is None:
             return None
 
-        with open(file_path, encoding="utf-8") as fp:
-            return fp.read()
+        _LOGGER.debug("Read cache file %s from memory", file_path)
+        return entry[0], time.time() - entry[1]
+
+    def read_cache(self, file_name: str, cache_time: int = 0) -> Optional[Any]:
+        """Read cached data."""
+        return self.read_cache_entry(file_name, cache_time)[0]
+
+    def save_cache(
+        self, file_name: str, content: Any, mtime: Optional[float] = None
+    ) -> Optional[float]:
+        """Save data to cache and return modification time of cache file.
 
-    def save_cache(self, file_name: str, content: Any) -> None:
-        """Save data to cache."""
+        Text content is stored in UTF-8. Content is compressed if compression
+        is set. Compressed files keep the name, so files stored with any
+        compression setting are read back: method is detected by magic number
+        on reading. If mtime is passed, it is set as modification time of cache
+        file.
+        """
         if self._cache_dir:
             if not os.path.exists(self._cache_dir):
-                os.makedirs(self._cache_dir)
+                os.makedirs(self._cache_dir, exist_ok=True)
 
             file_path = self._get_file_path(file_name)
             _LOGGER.debug("Store cache file %s", file_path)
 
-            with open(file_path, "w", encoding="utf-8") as fp:
-                fp.write(content)
+            # Write to temporary file and then rename it to not leave partially
+            # written cache file on failure
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self._cache_dir,
+                prefix=os.path.basename(self._get_file_path(TEMP_FILE_PREFIX)),
+                suffix=".tmp",
+            )
+            try:
+                data = content if isinstance(content, bytes) else content.encode()
+                if len(data) >= COMPRESS_MIN_SIZE:
+                    data = compress(data, self._compression)
+                with os.fdopen(fd, "wb") as fp:
+                    fp.write(data)
+                if mtime is not None:
+                    os.utime(tmp_path, (mtime, mtime))
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                with suppress(OSError):
+                    os.remove(tmp_path)
+                raise
+
+            mtime = os.path.getmtime(file_path)
+            if self._memory is not None:
+                self._memory.put(file_path, content, mtime)
+            return mtime
+        return None
+
+    def touch(self, file_name: str) -> Optional[float]:
+        """Mark cached data as just saved and return its modification time."""
+        file_path = self._get_file_path(file_name)
+        _LOGGER.debug("Touch cache file %s", file_path)
+        try:
+            os.utime(file_path)
+        except FileNotFoundError:
+            return None
+
+        mtime = os.path.getmtime(file_path)
+        if self._memory is not None:
+            self._memory.touch(file_path, mtime)
+        return mtime
+
+    async def async_read_cache_entry(
+        self, file_name: str, cache_time: int = 0, binary: bool = False
+    ) -> Tuple[Optional[Any], Optional[float]]:
+        """Read cached data and its age without blocking event loop."""
+        file_path = self._get_file_path(file_name)
+        entry = self._read_memory(file_path, cache_time)
+        if entry is not None:
+            return entry
+
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._read_file_entry, file_path, cache_time, binary
+        )
+
+    async def async_save_cache(
+        self, file_name: str, content: Any, mtime: Optional[float] = None
+    ) -> Optional[float]:
+        """Save data to cache without blocking event loop."""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.save_cache, file_name, content, mtime
+        )
+
+    async def async_touch(self, file_name: str) -> Optional[float]:
+        """Mark cached data as just saved without blocking event loop."""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.touch, file_name
+        )
@@ -27,9 +27,19 @@ from homeassistant.const import (
 from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
 
-from . import DOMAIN, get_gismeteo  # pylint: disable=unused-import
+from . import (  # pylint: disable=unused-import
+    DOMAIN,
+    async_get_location_index,
+    get_gismeteo,
+)
 from .api import ApiError
-from .const import CONF_FORECAST, FORECAST_MODE_DAILY, FORECAST_MODE_HOURLY, PLATFORMS
+from .const import (
+    CONF_DEDICATED_SESSION,
+    CONF_FORECAST,
+    FORECAST_MODE_DAILY,
+    FORECAST_MODE_HOURLY,
+    PLATFORMS,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -65,8 +75,9 @@ class GismeteoFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
 
         if user_input is not None:
             try:
+                city_index = await async_get_location_index(self.hass, user_input)
                 async with timeout(10):
-                    gismeteo = get_gismeteo(self.hass, user_input)
+                    gismeteo = get_gismeteo(self.hass, user_input, city_index)
                     await gismeteo.async_update()
             except (ApiError, ClientConnectorError, asyncio.TimeoutError, ClientError):
                 self._errors["base"] = "cannot_connect"
@@ -147,6 +158,10 @@ class GismeteoOptionsFlowHandler(config_entries.OptionsFlow):
                     CONF_SHOW_ON_MAP,
                     default=self.options.get(CONF_SHOW_ON_MAP, False),
                 ): bool,
+                vol.Required(
+                    CONF_DEDICATED_SESSION,
+                    default=self.options.get(CONF_DEDICATED_SESSION, False),
+                ): bool,
             }
         )
         return self.async_show_form(step_id="user", data_schema=vol.Schema(schema))
@@ -49,16 +49,27 @@ If you have ANY issues with this you need to open an issue here:
 PLATFORMS: Final = [SENSOR, WEATHER]
 
 # Configuration and options
+CONF_CACHE_COMPRESSION: Final = "cache_compression"
 CONF_CACHE_DIR: Final = "cache_dir"
+CONF_CITY_INDEX: Final = "city_index"
+CONF_DEDICATED_SESSION: Final = "dedicated_session"
 CONF_FORECAST: Final = "forecast"
+CONF_LOCATION_PRECISION: Final = "location_precision"
+CONF_PARSE_IN_PROCESS: Final = "parse_in_process"
+CONF_PARSE_THRESHOLD: Final = "parse_threshold"
 CONF_PLATFORMS: Final = "platforms"
 CONF_YAML: Final = "_yaml"
 
 FORECAST_MODE_HOURLY: Final = "hourly"
 FORECAST_MODE_DAILY: Final = "daily"
 
+CACHE_COMPRESSION_NONE: Final = "none"
+CACHE_COMPRESSION_GZIP: Final = "gzip"
+CACHE_COMPRESSION_ZSTD: Final = "zstd"
+
 # Defaults
 DEFAULT_NAME: Final = "Gismeteo"
+DEFAULT_CACHE_COMPRESSION: Final = CACHE_COMPRESSION_GZIP
 
 # Attributes
 ATTR_LAST_UPDATED: Final = "last_updated"
@@ -92,10 +103,52 @@ ATTR_LON = "lon"
 
 ENDPOINT_URL: Final = "https://services.gismeteo.ru/inform-service/inf_chrome"
 
+# Optional dump of Gismeteo cities in configuration directory
+CITIES_DUMP_FILE: Final = "gismeteo_cities.json"
+
+LOCATIONS_STORAGE_KEY: Final = f"{DOMAIN}.locations"
+LOCATIONS_STORAGE_VERSION: Final = 1
+LOCATIONS_SAVE_DELAY: Final = 10
+
 UPDATE_INTERVAL: Final = timedelta(minutes=5)
+UPDATE_INTERVAL_MIN: Final = timedelta(minutes=2)
+UPDATE_INTERVAL_MAX: Final = timedelta(hours=1)
+# Upstream data is polled this time after it is expected to be published
+UPDATE_PUBLISH_DELAY: Final = timedelta(seconds=30)
+# Polls of entries are spread over this window after expected publication
+UPDATE_SPREAD_WINDOW: Final = timedelta(minutes=2)
+# Number of observed publish periods used to estimate upstream cadence
+UPDATE_HISTORY_SIZE: Final = 8
 LOCATION_MAX_CACHE_INTERVAL: Final = timedelta(days=7)
+# Geohash precision of location cache keys (7 is about 150 x 150 m)
+LOCATION_CACHE_PRECISION: Final = 7
 FORECAST_MAX_CACHE_INTERVAL: Final = timedelta(hours=3)
 
+# Locations from configuration.yaml are set up when no new ones are registered
+# by platforms for quiet period, but not later than setup timeout
+YAML_QUIET_PERIOD: Final = timedelta(seconds=2)
+YAML_SETUP_TIMEOUT: Final = timedelta(seconds=12)
+# Number of locations set up simultaneously
+SETUP_CONCURRENCY: Final = 4
+
+# Housekeeping of cache directories. Only files of Gismeteo API client are
+# handled, as cache directory can be shared with other components
+CACHE_CLEANUP_INTERVAL: Final = timedelta(hours=1)
+CACHE_MAX_AGE: Final = LOCATION_MAX_CACHE_INTERVAL
+CACHE_MAX_SIZE: Final = 8 * 1024 * 1024
+CACHE_MAX_ENTRIES: Final = 512
+CACHE_FILE_PREFIXES: Final = ("forecast_", "location_")
+
+# Connections of dedicated HTTP session
+SESSION_LIMIT_PER_HOST: Final = 4
+SESSION_KEEPALIVE_TIMEOUT: Final = 300
+SESSION_DNS_CACHE_TTL: Final = 300
+
+# Responses larger than this (in bytes) are parsed in executor
+PARSE_EXECUTOR_THRESHOLD: Final = 32 * 1024
+# Number of worker processes parsing responses, if process pool is enabled
+PARSE_PROCESS_WORKERS: Final = 2
+
 CONDITION_FOG_CLASSES: Final = [
     11,
     12,
@@ -223,3 +276,15 @@ FORECAST_SENSOR_TYPE: Final = {
 
 COORDINATOR: Final = "coordinator"
 UNDO_UPDATE_LISTENER: Final = "undo_update_listener"
+
+DATA_CACHE_JANITOR: Final = f"{DOMAIN}_cache_janitor"
+DATA_CIRCUIT_BREAKER: Final = f"{DOMAIN}_circuit_breaker"
+DATA_CITY_INDEX: Final = f"{DOMAIN}_city_index"
+DATA_CONNECTION_STATS: Final = f"{DOMAIN}_connection_stats"
+DATA_FETCH_BROKER: Final = f"{DOMAIN}_fetch_broker"
+DATA_LOCATIONS: Final = f"{DOMAIN}_locations"
+DATA_MEMORY_CACHE: Final = f"{DOMAIN}_memory_cache"
+DATA_PARSE_EXECUTOR: Final = f"{DOMAIN}_parse_executor"
+DATA_SESSION: Final = f"{DOMAIN}_session"
+DATA_YAML_COLLECTED: Final = f"{DOMAIN}_yaml_collected"
+DATA_YAML_UPDATED: Final = f"{DOMAIN}_yaml_updated"
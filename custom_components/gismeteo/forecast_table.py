@@ -0,0 +1,340 @@
+#  Copyright (c) 2019-2022, Andrey "Limych" Khrolenok <andrey@khrolenok.ru>
+#  Creative Commons BY-NC-SA 4.0 International Public License
+#  (see LICENSE.md or https://creativecommons.org/licenses/by-nc-sa/4.0/)
+"""The Gismeteo component.
+
+For more details about this platform, please refer to the documentation at
+https://github.com/Limych/ha-gismeteo/
+"""
+
+from array import array
+from collections.abc import Iterator, Mapping, Sequence
+import math
+from typing import Any, Dict, List, Optional
+
+from homeassistant.components.weather import (
+    ATTR_CONDITION_CLEAR_NIGHT,
+    ATTR_CONDITION_CLOUDY,
+    ATTR_CONDITION_FOG,
+    ATTR_CONDITION_LIGHTNING,
+    ATTR_CONDITION_LIGHTNING_RAINY,
+    ATTR_CONDITION_PARTLYCLOUDY,
+    ATTR_CONDITION_POURING,
+    ATTR_CONDITION_RAINY,
+    ATTR_CONDITION_SNOWY,
+    ATTR_CONDITION_SNOWY_RAINY,
+    ATTR_CONDITION_SUNNY,
+    ATTR_CONDITION_WINDY,
+    ATTR_CONDITION_WINDY_VARIANT,
+    ATTR_FORECAST_CONDITION,
+    ATTR_FORECAST_TEMP,
+    ATTR_FORECAST_TEMP_LOW,
+    ATTR_FORECAST_TIME,
+    ATTR_FORECAST_WIND_BEARING,
+    ATTR_FORECAST_WIND_SPEED,
+)
+
+from .const import (
+    ATTR_FORECAST_CLOUDINESS,
+    ATTR_FORECAST_GEOMAGNETIC_FIELD,
+    ATTR_FORECAST_HUMIDITY,
+    ATTR_FORECAST_PHENOMENON,
+    ATTR_FORECAST_PRECIPITATION_AMOUNT,
+    ATTR_FORECAST_PRECIPITATION_INTENSITY,
+    ATTR_FORECAST_PRECIPITATION_TYPE,
+    ATTR_FORECAST_PRESSURE,
+    ATTR_FORECAST_STORM,
+    ATTR_SUNRISE,
+    ATTR_SUNSET,
+    CONDITION_FOG_CLASSES,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# Types of known forecast values. Values of other types are stored as is.
+COLUMN_TYPES: Dict[str, type] = {
+    ATTR_SUNRISE: int,
+    ATTR_SUNSET: int,
+    ATTR_FORECAST_TIME: float,
+    ATTR_FORECAST_CONDITION: str,
+    ATTR_FORECAST_TEMP: int,
+    ATTR_FORECAST_TEMP_LOW: int,
+    ATTR_FORECAST_PRESSURE: int,
+    ATTR_FORECAST_HUMIDITY: int,
+    ATTR_FORECAST_WIND_SPEED: int,
+    ATTR_FORECAST_WIND_BEARING: int,
+    ATTR_FORECAST_CLOUDINESS: int,
+    ATTR_FORECAST_PRECIPITATION_TYPE: int,
+    ATTR_FORECAST_PRECIPITATION_AMOUNT: float,
+    ATTR_FORECAST_PRECIPITATION_INTENSITY: int,
+    ATTR_FORECAST_STORM: bool,
+    ATTR_FORECAST_GEOMAGNETIC_FIELD: int,
+    ATTR_FORECAST_PHENOMENON: int,
+}
+
+_BOOL_NONE = -1
+
+
+class ForecastRow(Mapping):
+    """Read-only view of one forecast table row."""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "ForecastTable", index: int):
+        """Initialize."""
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any:
+        """Return value of row column."""
+        return self._table.value(key, self._index)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over column names."""
+        return iter(self._table.keys)
+
+    def __len__(self) -> int:
+        """Return number of columns."""
+        return len(self._table.keys)
+
+    def __repr__(self) -> str:
+        """Return representation of row."""
+        return repr(dict(self))
+
+
+class ForecastTable(Sequence):
+    """Compact column-oriented storage of forecast data.
+
+    Numeric values are kept in typed arrays with NaN in place of missing values.
+    Rows are exposed as read-only mappings, same as forecast dicts.
+    """
+
+    def __init__(self, rows: Optional[List[Dict[str, Any]]] = None):
+        """Initialize."""
+        self._columns: Dict[str, Any] = {}
+        self._size = 0
+
+        for row in rows or []:
+            self.append(row)
+
+    @property
+    def keys(self) -> List[str]:
+        """Return column names."""
+        return list(self._columns)
+
+    def append(self, row: Dict[str, Any]) -> None:
+        """Add row to table."""
+        if not self._columns:
+            for key in row:
+                self._columns[key] = self._new_column(COLUMN_TYPES.get(key))
+
+        for key, column in self._columns.items():
+            value = row.get(key)
+            if isinstance(column, list):
+                column.append(value)
+            elif column.typecode == "b":
+                column.append(_BOOL_NONE if value is None else int(value))
+            else:
+                column.append(math.nan if value is None else value)
+        self._size += 1
+
+    @staticmethod
+    def _new_column(kind: Optional[type]):
+        """Create storage for values of given type."""
+        if kind in (int, float):
+            return array("d")
+        if kind is bool:
+            return array("b")
+        return []
+
+    def value(self, key: str, index: int) -> Any:
+        """Return single value from table."""
+        value = self._columns[key][index]
+        kind = COLUMN_TYPES.get(key)
+        if kind is bool:
+            return None if value == _BOOL_NONE else bool(value)
+        if kind in (int, float):
+            if math.isnan(value):
+                return None
+            return int(value) if kind is int else value
+        return value
+
+    def column(self, key: str):
+        """Return all values of column.
+
+        Numeric columns are returned as NumPy arrays when NumPy is available.
+        """
+        column = self._columns[key]
+        if np is not None and isinstance(column, array):
+            return np.frombuffer(
+                column, dtype=np.float64 if column.typecode == "d" else np.int8
+            )
+        return column
+
+    def __getitem__(self, index):
+        """Return row or slice of rows."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("Forecast table index out of range")
+        return ForecastRow(self, index)
+
+    def __len__(self) -> int:
+        """Return number of rows."""
+        return self._size
+
+    def __eq__(self, other) -> bool:
+        """Compare table contents."""
+        if not isinstance(other, ForecastTable):
+            return NotImplemented
+        return [dict(x) for x in self] == [dict(x) for x in other]
+
+    __hash__ = None  # type: ignore[assignment]
+
+
+# Order of conditions is used as codes by batch classifier
+_CONDITIONS = (
+    None,
+    ATTR_CONDITION_SUNNY,
+    ATTR_CONDITION_CLEAR_NIGHT,
+    ATTR_CONDITION_PARTLYCLOUDY,
+    ATTR_CONDITION_CLOUDY,
+    ATTR_CONDITION_LIGHTNING,
+    ATTR_CONDITION_LIGHTNING_RAINY,
+    ATTR_CONDITION_RAINY,
+    ATTR_CONDITION_POURING,
+    ATTR_CONDITION_SNOWY,
+    ATTR_CONDITION_SNOWY_RAINY,
+    ATTR_CONDITION_WINDY,
+    ATTR_CONDITION_WINDY_VARIANT,
+    ATTR_CONDITION_FOG,
+)
+_COND = {x: i for i, x in enumerate(_CONDITIONS)}
+
+
+def batch_conditions(table: ForecastTable, daily: bool = False) -> List[Optional[str]]:
+    """Return conditions for all rows of forecast table.
+
+    Gives the same results as GismeteoApiClient.condition() applied to each row.
+    """
+    if not table:
+        return []
+
+    columns = {}
+    for key, default in (
+        (ATTR_FORECAST_TIME, math.nan),
+        (ATTR_SUNRISE, math.nan),
+        (ATTR_SUNSET, math.nan),
+        (ATTR_FORECAST_CLOUDINESS, math.nan),
+        (ATTR_FORECAST_PRECIPITATION_TYPE, math.nan),
+        (ATTR_FORECAST_PRECIPITATION_INTENSITY, math.nan),
+        (ATTR_FORECAST_STORM, _BOOL_NONE),
+        (ATTR_FORECAST_WIND_SPEED, math.nan),
+        (ATTR_FORECAST_PHENOMENON, math.nan),
+    ):
+        try:
+            columns[key] = table.column(key)
+        except KeyError:
+            columns[key] = [default] * len(table)
+
+    if np is not None:
+        return _batch_conditions_np(columns, daily)
+    return [
+        _CONDITIONS[_condition_code(*values, daily)]
+        for values in zip(*columns.values())
+    ]
+
+
+def _batch_conditions_np(columns: Dict[str, Any], daily: bool) -> List[Optional[str]]:
+    """Classify conditions with NumPy."""
+    fc_time, sunrise, sunset, cld, pr_type, pr_int, storm, wind, phenomenon = (
+        np.asarray(x) for x in columns.values()
+    )
+    storm = storm == 1
+
+    if daily:
+        clear = _COND[ATTR_CONDITION_SUNNY]
+    else:
+        clear = np.where(
+            (sunrise < fc_time) & (fc_time < sunset),
+            _COND[ATTR_CONDITION_SUNNY],
+            _COND[ATTR_CONDITION_CLEAR_NIGHT],
+        )
+    base = np.select(
+        [cld == 0, (cld == 1) | (cld == 2)],
+        [clear, _COND[ATTR_CONDITION_PARTLYCLOUDY]],
+        _COND[ATTR_CONDITION_CLOUDY],
+    )
+    windy = wind > 10.8
+
+    codes = np.select(
+        [
+            np.isnan(cld),
+            storm & (pr_type != 0),
+            storm,
+            (pr_type == 1) & (pr_int == 3),
+            pr_type == 1,
+            pr_type == 2,
+            pr_type == 3,
+            windy & (base == _COND[ATTR_CONDITION_CLOUDY]),
+            windy,
+            (cld == 0) & np.isin(phenomenon, CONDITION_FOG_CLASSES),
+        ],
+        [
+            _COND[None],
+            _COND[ATTR_CONDITION_LIGHTNING_RAINY],
+            _COND[ATTR_CONDITION_LIGHTNING],
+            _COND[ATTR_CONDITION_POURING],
+            _COND[ATTR_CONDITION_RAINY],
+            _COND[ATTR_CONDITION_SNOWY],
+            _COND[ATTR_CONDITION_SNOWY_RAINY],
+            _COND[ATTR_CONDITION_WINDY_VARIANT],
+            _COND[ATTR_CONDITION_WINDY],
+            _COND[ATTR_CONDITION_FOG],
+        ],
+        base,
+    )
+    return [_CONDITIONS[x] for x in codes.tolist()]
+
+
+def _condition_code(
+    fc_time, sunrise, sunset, cld, pr_type, pr_int, storm, wind, phenomenon, daily
+) -> int:
+    """Classify condition of single row without NumPy."""
+    if math.isnan(cld):
+        return _COND[None]
+
+    if cld == 0:
+        if daily or sunrise < fc_time < sunset:
+            code = _COND[ATTR_CONDITION_SUNNY]
+        else:
+            code = _COND[ATTR_CONDITION_CLEAR_NIGHT]
+    elif cld in (1, 2):
+        code = _COND[ATTR_CONDITION_PARTLYCLOUDY]
+    else:
+        code = _COND[ATTR_CONDITION_CLOUDY]
+
+    if storm == 1:
+        if pr_type != 0:
+            return _COND[ATTR_CONDITION_LIGHTNING_RAINY]
+        return _COND[ATTR_CONDITION_LIGHTNING]
+    if pr_type == 1:
+        if pr_int == 3:
+            return _COND[ATTR_CONDITION_POURING]
+        return _COND[ATTR_CONDITION_RAINY]
+    if pr_type == 2:
+        return _COND[ATTR_CONDITION_SNOWY]
+    if pr_type == 3:
+        return _COND[ATTR_CONDITION_SNOWY_RAINY]
+    if wind > 10.8:
+        if code == _COND[ATTR_CONDITION_CLOUDY]:
+            return _COND[ATTR_CONDITION_WINDY_VARIANT]
+        return _COND[ATTR_CONDITION_WINDY]
+    if cld == 0 and phenomenon in CONDITION_FOG_CLASSES:
+        return _COND[ATTR_CONDITION_FOG]
+    return code
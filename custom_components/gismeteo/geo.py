@@ -0,0 +1,206 @@
+#  Copyright (c) 2019-2022, Andrey "Limych" Khrolenok <andrey@khrolenok.ru>
+#  Creative Commons BY-NC-SA 4.0 International Public License
+#  (see LICENSE.md or https://creativecommons.org/licenses/by-nc-sa/4.0/)
+"""The Gismeteo component.
+
+For more details about this platform, please refer to the documentation at
+https://github.com/Limych/ha-gismeteo/
+"""
+
+import glob
+import json
+import logging
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import xml.etree.ElementTree as etree  # type: ignore
+
+from homeassistant.const import ATTR_ID, ATTR_LATITUDE, ATTR_LONGITUDE, ATTR_NAME
+
+from .cache import read_file
+
+_LOGGER = logging.getLogger(__name__)
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+EARTH_RADIUS = 6371.0  # km
+
+# Precision of geohash cells used by city index (about 4.9 x 4.9 km)
+CITY_INDEX_PRECISION = 5
+# Nearest city farther than this (in km) is not trusted, as the index contains
+# only part of all cities
+CITY_INDEX_MAX_DISTANCE = 5.0
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int) -> str:
+    """Return geohash of coordinates."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    result = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(result) < precision:
+        if even:
+            rng, value = lon_range, longitude
+        else:
+            rng, value = lat_range, latitude
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            result.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(result)
+
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """Return height and width of geohash cell in degrees."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** (bits - bits // 2)
+
+
+def geohash_neighbors(latitude: float, longitude: float, precision: int) -> List[str]:
+    """Return geohashes of cell containing coordinates and of cells around it."""
+    height, width = geohash_cell_size(precision)
+    cells = []
+    for d_lat in (0, -height, height):
+        lat = latitude + d_lat
+        if not -90 <= lat <= 90:
+            continue
+        for d_lon in (0, -width, width):
+            lon = (longitude + d_lon + 180) % 360 - 180
+            cell = geohash_encode(lat, lon, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Return great-circle distance between two points in km."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    hav = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(hav))
+
+
+class CityIndex:
+    """Spatial index of known Gismeteo cities.
+
+    Cities are put to geohash grid cells, so nearest city is searched only
+    among cities of the cell containing point and of cells around it.
+    """
+
+    def __init__(self, precision: int = CITY_INDEX_PRECISION):
+        """Initialize."""
+        self._precision = precision
+        self._cells: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        # Cache directories cities were loaded from
+        self.cache_dirs: Set[str] = set()
+
+    def __len__(self) -> int:
+        """Return number of cities in index."""
+        return sum(len(x) for x in self._cells.values())
+
+    def add(self, city: Dict[str, Any]) -> None:
+        """Add city to index."""
+        try:
+            cell = geohash_encode(
+                city[ATTR_LATITUDE], city[ATTR_LONGITUDE], self._precision
+            )
+        except (KeyError, TypeError):
+            return
+        if city.get(ATTR_ID) is None:
+            return
+        self._cells.setdefault(cell, {})[city[ATTR_ID]] = {
+            ATTR_ID: city[ATTR_ID],
+            ATTR_NAME: city.get(ATTR_NAME),
+            ATTR_LATITUDE: city[ATTR_LATITUDE],
+            ATTR_LONGITUDE: city[ATTR_LONGITUDE],
+        }
+
+    def add_many(self, cities: Iterable[Dict[str, Any]]) -> None:
+        """Add several cities to index."""
+        for city in cities:
+            self.add(city)
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        max_distance: float = CITY_INDEX_MAX_DISTANCE,
+    ) -> Optional[Dict[str, Any]]:
+        """Return city nearest to coordinates, if it is close enough."""
+        found = None
+        found_distance = max_distance
+        for cell in geohash_neighbors(latitude, longitude, self._precision):
+            for city in self._cells.get(cell, {}).values():
+                dist = distance(
+                    latitude, longitude, city[ATTR_LATITUDE], city[ATTR_LONGITUDE]
+                )
+                if dist <= found_distance:
+                    found, found_distance = city, dist
+        return dict(found) if found is not None else None
+
+    def load_dump(self, file_path: str) -> None:
+        """Add cities from dump file.
+
+        Dump is JSON list of objects with the same attributes as items of
+        location response: id, n (name), lat and lng.
+        """
+        try:
+            with open(file_path, encoding="utf-8") as fp:
+                items = json.load(fp)
+        except (OSError, ValueError) as ex:
+            _LOGGER.warning("Can't read cities dump %s: %s", file_path, ex)
+            return
+
+        for item in items:
+            try:
+                self.add(_city(item))
+            except (AttributeError, TypeError, ValueError):
+                continue
+        _LOGGER.debug("Cities dump %s loaded", file_path)
+
+
+def _city(item) -> Dict[str, Any]:
+    """Return city data from attributes of location item."""
+    lon = float(item.get("lng"))
+    return {
+        ATTR_ID: int(item.get("id")),
+        ATTR_NAME: item.get("n"),
+        ATTR_LATITUDE: float(item.get("lat")),
+        ATTR_LONGITUDE: (lon - 360) if lon > 180 else lon,
+    }
+
+
+def read_cached_cities(cache_dir: str) -> List[Dict[str, Any]]:
+    """Return cities from cached responses of location requests."""
+    cities = []
+    for file_path in glob.glob(os.path.join(cache_dir, "location_*.xml")):
+        try:
+            cities.extend(parse_cities(read_file(file_path)))
+        except (OSError, ValueError, etree.ParseError) as ex:
+            _LOGGER.debug("Can't read cities from %s: %s", file_path, ex)
+    return cities
+
+
+def parse_cities(response: str) -> List[Dict[str, Any]]:
+    """Return all cities from response of location request."""
+    cities = []
+    for item in etree.fromstring(response).iter("item"):
+        try:
+            cities.append(_city(item))
+        except (TypeError, ValueError):
+            continue
+    return cities
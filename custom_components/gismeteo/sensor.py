@@ -28,22 +28,24 @@ from homeassistant.const import (
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import config_validation as cv
 
-from . import GismeteoDataUpdateCoordinator
+from . import GismeteoDataUpdateCoordinator, async_register_yaml_location
 from .const import (
-    ATTR_WEATHER_CLOUDINESS,
-    ATTR_WEATHER_GEOMAGNETIC_FIELD,
-    ATTR_WEATHER_PRECIPITATION_AMOUNT,
-    ATTR_WEATHER_PRECIPITATION_INTENSITY,
-    ATTR_WEATHER_PRECIPITATION_TYPE,
-    ATTR_WEATHER_STORM,
+    CACHE_COMPRESSION_GZIP,
+    CACHE_COMPRESSION_NONE,
+    CACHE_COMPRESSION_ZSTD,
+    CONF_CACHE_COMPRESSION,
     CONF_CACHE_DIR,
+    CONF_CITY_INDEX,
+    CONF_DEDICATED_SESSION,
     CONF_FORECAST,
+    CONF_LOCATION_PRECISION,
+    CONF_PARSE_IN_PROCESS,
+    CONF_PARSE_THRESHOLD,
     CONF_YAML,
     COORDINATOR,
     DEFAULT_NAME,
     DOMAIN,
     FORECAST_SENSOR_TYPE,
-    PRECIPITATION_AMOUNT,
     SENSOR,
     SENSOR_TYPES,
 )
@@ -60,6 +62,16 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
         ),
         vol.Optional(CONF_FORECAST, default=False): cv.boolean,
         vol.Optional(CONF_CACHE_DIR): cv.string,
+        vol.Optional(CONF_CACHE_COMPRESSION): vol.In(
+            [CACHE_COMPRESSION_NONE, CACHE_COMPRESSION_GZIP, CACHE_COMPRESSION_ZSTD]
+        ),
+        vol.Optional(CONF_CITY_INDEX): cv.boolean,
+        vol.Optional(CONF_DEDICATED_SESSION): cv.boolean,
+        vol.Optional(CONF_LOCATION_PRECISION): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=12)
+        ),
+        vol.Optional(CONF_PARSE_THRESHOLD): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(CONF_PARSE_IN_PROCESS): cv.boolean,
     }
 )
 
@@ -69,17 +81,11 @@ async def async_setup_platform(
     hass: HomeAssistant, config, add_entities, discovery_info=None
 ):
     """Set up the Gismeteo sensor platform."""
-    if CONF_YAML not in hass.data[DOMAIN]:
-        hass.data[DOMAIN].setdefault(CONF_YAML, {})
-        hass.async_create_task(
-            hass.config_entries.flow.async_init(
-                DOMAIN, context={"source": SOURCE_IMPORT}, data={}
-            )
-        )
-
     uid = "-".join([SENSOR, config[CONF_NAME]])
     config[CONF_PLATFORM] = SENSOR
-    hass.data[DOMAIN][CONF_YAML][uid] = config
+    coordinator = await async_register_yaml_location(hass, uid, config)
+    if coordinator is not None:
+        add_entities(_gen_entities(config[CONF_NAME], coordinator, config, True))
 
 
 def fix_kinds(kinds: List[str], warn=True) -> List[str]:
@@ -139,6 +145,9 @@ async def async_setup_entry(
             if cfg[CONF_PLATFORM] != SENSOR:
                 continue  # pragma: no cover
 
+            if uid not in hass.data[DOMAIN]:
+                continue  # Registered late and set up by platform
+
             location_name = cfg[CONF_NAME]
             coordinator = hass.data[DOMAIN][uid][COORDINATOR]
 
@@ -200,7 +209,6 @@ class GismeteoSensor(GismeteoEntity, SensorEntity):
     @property
     def native_value(self):
         """Return the value reported by the sensor."""
-        data = self._gismeteo.current
         try:
             if self._kind == "condition":
                 self._state = self._gismeteo.condition()
@@ -221,33 +229,15 @@ class GismeteoSensor(GismeteoEntity, SensorEntity):
             elif self._kind == "pressure_mmhg":
                 self._state = self._gismeteo.pressure_mmhg()
             elif self._kind == "clouds":
-                self._state = int(data.get(ATTR_WEATHER_CLOUDINESS) * 100 / 3)
+                self._state = self._gismeteo.snapshot.clouds
             elif self._kind == "rain":
-                self._state = (
-                    (
-                        data.get(ATTR_WEATHER_PRECIPITATION_AMOUNT)
-                        or PRECIPITATION_AMOUNT[
-                            data.get(ATTR_WEATHER_PRECIPITATION_INTENSITY)
-                        ]
-                    )
-                    if data.get(ATTR_WEATHER_PRECIPITATION_TYPE) in [1, 3]
-                    else 0
-                )
+                self._state = self._gismeteo.snapshot.rain
             elif self._kind == "snow":
-                self._state = (
-                    (
-                        data.get(ATTR_WEATHER_PRECIPITATION_AMOUNT)
-                        or PRECIPITATION_AMOUNT[
-                            data.get(ATTR_WEATHER_PRECIPITATION_INTENSITY)
-                        ]
-                    )
-                    if data.get(ATTR_WEATHER_PRECIPITATION_TYPE) in [2, 3]
-                    else 0
-                )
+                self._state = self._gismeteo.snapshot.snow
             elif self._kind == "storm":
-                self._state = data.get(ATTR_WEATHER_STORM)
+                self._state = self._gismeteo.snapshot.storm
             elif self._kind == "geomagnetic":
-                self._state = data.get(ATTR_WEATHER_GEOMAGNETIC_FIELD)
+                self._state = self._gismeteo.snapshot.geomagnetic
             elif self._kind == "water_temperature":
                 self._state = self._gismeteo.water_temperature()
 
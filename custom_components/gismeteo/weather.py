@@ -27,10 +27,19 @@ from homeassistant.const import (
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import config_validation as cv
 
-from . import GismeteoDataUpdateCoordinator
+from . import GismeteoDataUpdateCoordinator, async_register_yaml_location
 from .const import (
     ATTRIBUTION,
+    CACHE_COMPRESSION_GZIP,
+    CACHE_COMPRESSION_NONE,
+    CACHE_COMPRESSION_ZSTD,
+    CONF_CACHE_COMPRESSION,
     CONF_CACHE_DIR,
+    CONF_CITY_INDEX,
+    CONF_DEDICATED_SESSION,
+    CONF_LOCATION_PRECISION,
+    CONF_PARSE_IN_PROCESS,
+    CONF_PARSE_THRESHOLD,
     CONF_YAML,
     COORDINATOR,
     DEFAULT_NAME,
@@ -53,6 +62,16 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
             [FORECAST_MODE_HOURLY, FORECAST_MODE_DAILY]
         ),
         vol.Optional(CONF_CACHE_DIR): cv.string,
+        vol.Optional(CONF_CACHE_COMPRESSION): vol.In(
+            [CACHE_COMPRESSION_NONE, CACHE_COMPRESSION_GZIP, CACHE_COMPRESSION_ZSTD]
+        ),
+        vol.Optional(CONF_CITY_INDEX): cv.boolean,
+        vol.Optional(CONF_DEDICATED_SESSION): cv.boolean,
+        vol.Optional(CONF_LOCATION_PRECISION): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=12)
+        ),
+        vol.Optional(CONF_PARSE_THRESHOLD): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(CONF_PARSE_IN_PROCESS): cv.boolean,
     }
 )
 
@@ -62,17 +81,11 @@ async def async_setup_platform(
     hass: HomeAssistant, config, add_entities, discovery_info=None
 ):
     """Set up the Gismeteo weather platform."""
-    if CONF_YAML not in hass.data[DOMAIN]:
-        hass.data[DOMAIN].setdefault(CONF_YAML, {})
-        hass.async_create_task(
-            hass.config_entries.flow.async_init(
-                DOMAIN, context={"source": SOURCE_IMPORT}, data={}
-            )
-        )
-
     uid = WEATHER + config[CONF_NAME]
     config[CONF_PLATFORM] = WEATHER
-    hass.data[DOMAIN][CONF_YAML][uid] = config
+    coordinator = await async_register_yaml_location(hass, uid, config)
+    if coordinator is not None:
+        add_entities([GismeteoWeather(config[CONF_NAME], coordinator, config)])
 
 
 async def async_setup_entry(hass: HomeAssistant, config_entry, async_add_entities):
@@ -84,6 +97,9 @@ async def async_setup_entry(hass: HomeAssistant, config_entry, async_add_entitie
             if config[CONF_PLATFORM] != WEATHER:
                 continue  # pragma: no cover
 
+            if uid not in hass.data[DOMAIN]:
+                continue  # Registered late and set up by platform
+
             name = config[CONF_NAME]
             coordinator = hass.data[DOMAIN][uid][COORDINATOR]
 
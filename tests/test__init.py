@@ -1,20 +1,67 @@
 """Tests for GisMeteo integration."""
 # pylint: disable=redefined-outer-name
 
-from unittest.mock import patch
+import asyncio
+from datetime import datetime, timedelta, timezone
+import os
+import time
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
-from pytest_homeassistant_custom_component.common import MockConfigEntry, load_fixture
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+    load_fixture,
+)
 
+from custom_components.gismeteo import (
+    GismeteoDataUpdateCoordinator,
+    _async_update_location,
+    _async_wait_yaml_locations,
+    async_get_cache_janitor,
+    async_get_location_index,
+    async_get_location_store,
+    async_get_session,
+    async_get_yaml_updated,
+    get_gismeteo,
+)
 from custom_components.gismeteo.api import ApiError, GismeteoApiClient
-from custom_components.gismeteo.const import CONF_FORECAST, DOMAIN
+from custom_components.gismeteo.const import (
+    ATTR_LAST_UPDATED,
+    CACHE_CLEANUP_INTERVAL,
+    CACHE_MAX_AGE,
+    CONF_CACHE_DIR,
+    CONF_CITY_INDEX,
+    CONF_DEDICATED_SESSION,
+    CONF_FORECAST,
+    CONF_PARSE_IN_PROCESS,
+    CONF_PARSE_THRESHOLD,
+    COORDINATOR,
+    DOMAIN,
+    LOCATIONS_STORAGE_KEY,
+    UPDATE_HISTORY_SIZE,
+    UPDATE_INTERVAL,
+    UPDATE_INTERVAL_MAX,
+    UPDATE_INTERVAL_MIN,
+    UPDATE_PUBLISH_DELAY,
+    UPDATE_SPREAD_WINDOW,
+)
 from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN
 from homeassistant.components.weather import DOMAIN as WEATHER_DOMAIN
 from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import (
+    ATTR_ID,
+    CONF_NAME,
+    CONF_PLATFORM,
+    EVENT_HOMEASSISTANT_CLOSE,
+    EVENT_HOMEASSISTANT_STOP,
+)
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.setup import async_setup_component
+from homeassistant.util import dt as dt_util
 
-from .const import MOCK_CONFIG
+from .const import MOCK_CONFIG, MOCK_LATITUDE, MOCK_LONGITUDE
 
 
 @pytest.fixture()
@@ -94,3 +141,344 @@ async def test_unload_entry(hass: HomeAssistant, gismeteo_config, gismeteo_api):
 
     assert entry.state == ConfigEntryState.NOT_LOADED
     assert not hass.data.get(DOMAIN)
+
+
+async def test_adaptive_update_interval(hass: HomeAssistant):
+    """Test learning of upstream publishing cadence."""
+    gismeteo = Mock()
+    gismeteo.attributes = {}
+    coordinator = GismeteoDataUpdateCoordinator(hass, "0123456", gismeteo)
+    coordinator._phase = 0
+    start = datetime(2021, 2, 21, 12, 0, tzinfo=timezone.utc)
+
+    def next_interval(published, now):
+        gismeteo.attributes[ATTR_LAST_UPDATED] = published.isoformat()
+        with patch("homeassistant.util.dt.utcnow", return_value=now), patch(
+            "random.random", return_value=0
+        ):
+            return coordinator._next_update_interval()
+
+    # Cadence is unknown until first change of data
+    assert next_interval(start, start) == UPDATE_INTERVAL
+    assert next_interval(start, start + timedelta(minutes=7)) == timedelta(minutes=3)
+    assert next_interval(start, start + timedelta(minutes=8)) == timedelta(minutes=7)
+
+    published = start + timedelta(minutes=20)
+    now = published + timedelta(minutes=3)
+    assert next_interval(published, now) == (
+        timedelta(minutes=17) + UPDATE_PUBLISH_DELAY
+    )
+
+    # Missed publication does not break estimation
+    published += timedelta(minutes=40)
+    assert next_interval(published, published) == (
+        timedelta(minutes=20) + UPDATE_PUBLISH_DELAY
+    )
+
+    # Late publication is polled often
+    assert next_interval(published, published + timedelta(minutes=30)) == (
+        UPDATE_INTERVAL_MIN
+    )
+
+    # Polls of entries are spread over short window after publication
+    coordinator._phase = 0.5
+    assert next_interval(published, published) == (
+        timedelta(minutes=20) + UPDATE_PUBLISH_DELAY + UPDATE_SPREAD_WINDOW / 2
+    )
+    # Poll of last phase does not overshoot next publication
+    coordinator._phase = 0.99
+    assert next_interval(published, published) == (
+        timedelta(minutes=20) + UPDATE_PUBLISH_DELAY + UPDATE_SPREAD_WINDOW * 0.99
+    )
+    coordinator._phase = 0
+
+    # Rare publications are still polled
+    for _ in range(UPDATE_HISTORY_SIZE):
+        published += timedelta(hours=10)
+        next_interval(published, published)
+    assert next_interval(published, published) == UPDATE_INTERVAL_MAX
+
+
+@pytest.mark.parametrize("phase", [0, 0.5, 0.99])
+async def test_adaptive_update_cycles(hass: HomeAssistant, phase):
+    """Test stability of learned cadence over many polls."""
+    gismeteo = Mock()
+    gismeteo.attributes = {}
+    coordinator = GismeteoDataUpdateCoordinator(hass, "0123456", gismeteo)
+    coordinator._phase = phase
+    start = datetime(2021, 2, 21, 12, 0, tzinfo=timezone.utc)
+    period = timedelta(minutes=20)
+    lag = UPDATE_PUBLISH_DELAY + UPDATE_SPREAD_WINDOW * phase
+
+    now = start
+    for cycle in range(30):
+        published = start + period * ((now - start) // period)
+        gismeteo.attributes[ATTR_LAST_UPDATED] = published.isoformat()
+        with patch("homeassistant.util.dt.utcnow", return_value=now):
+            interval = coordinator._next_update_interval()
+        now += interval
+
+        if cycle >= 5:
+            # Each poll gets new data soon after it is published
+            assert now - (published + period) == pytest.approx(
+                lag, abs=timedelta(seconds=1)
+            )
+
+
+async def test_update_scheduling(hass: HomeAssistant):
+    """Test scheduling of next poll after update."""
+    gismeteo = Mock()
+    gismeteo.attributes = {}
+    gismeteo.revalidations = []
+    gismeteo.async_update = AsyncMock()
+    coordinator = GismeteoDataUpdateCoordinator(hass, "0123456", gismeteo)
+
+    coordinator.update_interval = UPDATE_INTERVAL_MIN
+    await coordinator.async_refresh()
+    assert coordinator.last_update_success
+    assert coordinator.update_interval >= UPDATE_INTERVAL / 2
+    # Data cached by this poll is not used by the next one
+    assert gismeteo.cache_time == coordinator.update_interval.total_seconds() / 2
+
+    # Timed out update is retried soon
+    gismeteo.async_update.side_effect = asyncio.TimeoutError
+    coordinator.update_interval = UPDATE_INTERVAL_MAX
+    await coordinator.async_refresh()
+    assert not coordinator.last_update_success
+    assert coordinator.update_interval < UPDATE_INTERVAL * 3 / 2
+    assert gismeteo.cache_time == coordinator.update_interval.total_seconds() / 2
+
+
+async def test_staggered_update_interval(hass: HomeAssistant):
+    """Test spreading of polls of different entries."""
+    now = datetime(2021, 2, 21, 12, 0, tzinfo=timezone.utc)
+    period = UPDATE_INTERVAL.total_seconds()
+
+    slots = set()
+    for uid in ("0123456", "1234567", "2345678", "3456789"):
+        coordinator = GismeteoDataUpdateCoordinator(hass, uid, Mock())
+        assert (
+            coordinator._phase
+            == GismeteoDataUpdateCoordinator(hass, uid, Mock())._phase
+        )
+
+        with patch("homeassistant.util.dt.utcnow", return_value=now):
+            delay = coordinator._staggered_interval(UPDATE_INTERVAL)
+        assert UPDATE_INTERVAL / 2 <= delay < UPDATE_INTERVAL * 3 / 2
+
+        slot = round((now + delay).timestamp() % period, 3)
+        assert slot == round(coordinator._phase * period, 3)
+        slots.add(slot)
+
+        # Polls keep the same slot
+        with patch("homeassistant.util.dt.utcnow", return_value=now + delay):
+            assert coordinator._staggered_interval(UPDATE_INTERVAL) == pytest.approx(
+                UPDATE_INTERVAL, abs=timedelta(milliseconds=1)
+            )
+
+    assert len(slots) == 4
+
+
+async def test_revalidated_update(hass: HomeAssistant):
+    """Test update of data after background refresh of cached data."""
+    gismeteo = Mock(attributes={}, async_update=AsyncMock(return_value=True))
+    coordinator = GismeteoDataUpdateCoordinator(hass, "0123456", gismeteo)
+
+    for changed in (False, True):
+        task = hass.loop.create_future()
+        gismeteo.revalidations = [task]
+        with patch.object(coordinator, "async_request_refresh") as request_refresh:
+            await coordinator._async_update_data()
+            task.set_result(changed)
+            await hass.async_block_till_done()
+
+        assert request_refresh.called is changed
+
+
+async def test_wait_yaml_locations(hass: HomeAssistant):
+    """Test waiting for registration of locations from configuration.yaml."""
+    updated = async_get_yaml_updated(hass)
+
+    async def register(count):
+        for _ in range(count):
+            await asyncio.sleep(0.05)
+            updated.set()
+
+    with patch(
+        "custom_components.gismeteo.YAML_QUIET_PERIOD", timedelta(seconds=0.1)
+    ), patch("custom_components.gismeteo.YAML_SETUP_TIMEOUT", timedelta(seconds=1)):
+        # Wait ends after quiet period since last registration
+        start = hass.loop.time()
+        await asyncio.gather(_async_wait_yaml_locations(hass), register(4))
+        assert 0.3 <= hass.loop.time() - start < 0.6
+
+        # Wait is limited by setup timeout
+        task = hass.async_create_task(register(40))
+        start = hass.loop.time()
+        await _async_wait_yaml_locations(hass)
+        assert 1 <= hass.loop.time() - start < 1.5
+        task.cancel()
+
+
+async def test_stored_location(
+    hass: HomeAssistant, hass_storage, gismeteo_config, gismeteo_api
+):
+    """Test reuse of location resolved on previous run."""
+    hass_storage[LOCATIONS_STORAGE_KEY] = {
+        "version": 1,
+        "key": LOCATIONS_STORAGE_KEY,
+        "data": {
+            f"{MOCK_LATITUDE},{MOCK_LONGITUDE}": {
+                "id": 123,
+                "name": "Stored",
+                "latitude": 55.5,
+                "longitude": 122.1,
+                "updated": time.time(),
+            },
+        },
+    }
+
+    with patch.object(GismeteoApiClient, "async_get_location") as get_location:
+        await async_gismeteo_entry(hass, gismeteo_config)
+
+    get_location.assert_not_called()
+    coordinator = hass.data[DOMAIN][gismeteo_config.entry_id][COORDINATOR]
+    assert coordinator.gismeteo.attributes[ATTR_ID] == 123
+    assert coordinator.gismeteo.latitude == 55.5
+
+
+async def test_resolved_location(hass: HomeAssistant, gismeteo_config, gismeteo_api):
+    """Test storing of resolved location."""
+    await async_gismeteo_entry(hass, gismeteo_config)
+
+    store = await async_get_location_store(hass)
+    location = store.get(MOCK_LATITUDE, MOCK_LONGITUDE)
+    assert location["id"] == 167413
+    assert location["name"] == "Razvilka"
+
+
+async def test_location_index(hass: HomeAssistant, tmpdir):
+    """Test city index enabled by configuration."""
+    config = {CONF_CACHE_DIR: str(tmpdir)}
+    assert await async_get_location_index(hass, config) is None
+
+    (tmpdir / "location_55.59_-162.26.xml").write(load_fixture("location.xml"))
+    config[CONF_CITY_INDEX] = True
+    index = await async_get_location_index(hass, config)
+    assert index.nearest(55.59, -162.26)[ATTR_ID] == 167413
+
+    # Cache directory is read only once
+    (tmpdir / "location_55.59_-162.26.xml").remove()
+    with patch.object(index, "add_many") as add_many:
+        assert await async_get_location_index(hass, config) is index
+    add_many.assert_not_called()
+
+    # Background refresh of location does not use index
+    with patch(
+        "custom_components.gismeteo.get_gismeteo", wraps=get_gismeteo
+    ) as mock_get, patch.object(GismeteoApiClient, "async_get_location"):
+        await _async_update_location(hass, config)
+    assert mock_get.call_args[0][1:] == (config,)
+
+
+async def test_dedicated_session(hass: HomeAssistant):
+    """Test dedicated HTTP session."""
+    session = async_get_session(hass)
+    assert async_get_session(hass) is session
+    assert session.connector.limit_per_host == 4
+    assert not session.closed
+
+    # Dedicated session is used only if enabled
+    assert get_gismeteo(hass, MOCK_CONFIG)._session is async_get_clientsession(hass)
+    gismeteo = get_gismeteo(hass, {**MOCK_CONFIG, CONF_DEDICATED_SESSION: True})
+    assert gismeteo._session is session
+
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_CLOSE)
+    await hass.async_block_till_done()
+    assert session.closed
+
+
+async def test_cache_janitor(hass: HomeAssistant, gismeteo_api, tmpdir, caplog):
+    """Test periodic housekeeping of cache directory."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="Home",
+        unique_id="0123456",
+        data={**MOCK_CONFIG, CONF_CACHE_DIR: str(tmpdir)},
+    )
+    await async_gismeteo_entry(hass, entry)
+
+    mtime = time.time() - CACHE_MAX_AGE.total_seconds() - 60
+    for file_name in ("location_abc.xml", "forecast_123.xml", "other.json"):
+        (tmpdir / file_name).write("content")
+        os.utime(tmpdir / file_name, (mtime, mtime))
+    (tmpdir / "forecast_456.xml").write("content")
+
+    async_fire_time_changed(hass, dt_util.utcnow() + CACHE_CLEANUP_INTERVAL)
+    await hass.async_block_till_done()
+
+    # Only expired files of Gismeteo are removed
+    assert sorted(x.basename for x in tmpdir.listdir()) == [
+        "forecast_456.xml",
+        "other.json",
+    ]
+    stats = async_get_cache_janitor(hass).stats
+    assert stats["runs"] == 1
+    assert stats["expired"] == 2
+    assert stats["entries"] == 1
+    assert "Cache cleanup removed 2 expired and 0 evicted files" in caplog.text
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+    async_fire_time_changed(hass, dt_util.utcnow() + 2 * CACHE_CLEANUP_INTERVAL)
+    await hass.async_block_till_done()
+    assert async_get_cache_janitor(hass).stats["runs"] == 1
+
+
+async def test_yaml_cache_janitor(hass: HomeAssistant, gismeteo_api):
+    """Test stop of cache housekeeping on unload of locations from YAML."""
+    config = {
+        SENSOR_DOMAIN: {
+            CONF_PLATFORM: DOMAIN,
+            CONF_NAME: "Office",
+        },
+    }
+    with patch("custom_components.gismeteo.YAML_QUIET_PERIOD", timedelta(0)):
+        assert await async_setup_component(hass, SENSOR_DOMAIN, config)
+        await hass.async_block_till_done()
+
+    janitor = async_get_cache_janitor(hass)
+    assert janitor._unsub is not None
+    assert COORDINATOR in hass.data[DOMAIN]["sensor-Office"]
+
+    (entry,) = hass.config_entries.async_entries(DOMAIN)
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert "sensor-Office" not in hass.data[DOMAIN]
+    assert janitor._unsub is None
+
+
+async def test_parse_options(hass: HomeAssistant):
+    """Test configuration of response parsing."""
+    gismeteo = get_gismeteo(hass, MOCK_CONFIG)
+    assert gismeteo._parse_threshold == 32 * 1024
+    assert gismeteo._parse_executor is None
+
+    gismeteo = get_gismeteo(
+        hass, {**MOCK_CONFIG, CONF_PARSE_THRESHOLD: 0, CONF_PARSE_IN_PROCESS: True}
+    )
+    assert gismeteo._parse_threshold == 0
+    executor = gismeteo._parse_executor
+    assert (
+        executor
+        is get_gismeteo(
+            hass, {**MOCK_CONFIG, CONF_PARSE_IN_PROCESS: True}
+        )._parse_executor
+    )
+
+    with patch.object(executor, "shutdown") as shutdown:
+        hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+        await hass.async_block_till_done()
+    shutdown.assert_called_once()
@@ -9,20 +9,32 @@
 For more details about this platform, please refer to the documentation at
 https://github.com/Limych/ha-gismeteo/
 """
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 from typing import Any, Optional
 from unittest.mock import Mock, patch
+import xml.etree.ElementTree as etree  # type: ignore
 
-from aiohttp import ClientSession
-from pytest import raises
+from aiohttp import ClientSession, hdrs, web
+from pytest import approx, raises
 from pytest_homeassistant_custom_component.common import load_fixture
 
 from custom_components.gismeteo.api import (
+    RETRY_ATTEMPTS,
     ApiError,
     GismeteoApiClient,
+    GismeteoCircuitBreaker,
+    GismeteoConnectionStats,
+    GismeteoFetchBroker,
+    GismeteoForecastParser,
+    GismeteoMultiClient,
     InvalidCoordinatesError,
+    parse_forecast,
 )
+from custom_components.gismeteo.cache import Cache
 from custom_components.gismeteo.const import (
+    ATTR_SUNSET,
     ATTR_WEATHER_CLOUDINESS,
     ATTR_WEATHER_PHENOMENON,
     ATTR_WEATHER_PRECIPITATION_INTENSITY,
@@ -31,8 +43,14 @@ from custom_components.gismeteo.const import (
     CONDITION_FOG_CLASSES,
     FORECAST_MODE_DAILY,
     FORECAST_MODE_HOURLY,
+    LOCATION_CACHE_PRECISION,
+)
+from custom_components.gismeteo.geo import geohash_cell_size, geohash_encode
+from homeassistant.components.weather import (
+    ATTR_CONDITION_CLEAR_NIGHT,
+    ATTR_CONDITION_SUNNY,
+    ATTR_WEATHER_WIND_SPEED,
 )
-from homeassistant.components.weather import ATTR_WEATHER_WIND_SPEED
 from homeassistant.const import ATTR_ID, ATTR_NAME
 
 LATITUDE = 52.0677904
@@ -104,6 +122,77 @@ async def test__async_get_data(mock_get, caplog):
     assert len(caplog.records) == 4
 
 
+@patch("aiohttp.ClientSession.get")
+async def test__async_get_data_streaming(mock_get):
+    """Test feeding of response to parser while it arrives."""
+    raw = load_fixture("forecast.xml").encode("utf-8")
+
+    async def mock_chunks(size):
+        for i in range(0, len(raw), size):
+            yield raw[i : i + size]
+
+    mock_resp = mock_get.return_value.__aenter__.return_value
+    mock_resp.status = HTTPStatus.OK
+    mock_resp.content.iter_chunked = mock_chunks
+    mock_resp.charset = "utf-8"
+
+    parser = GismeteoForecastParser()
+    async with ClientSession() as client:
+        gismeteo = GismeteoApiClient(client, latitude=LATITUDE, longitude=LONGITUDE)
+        data = await gismeteo._async_get_data("some_url", parser=parser)
+
+    assert data == raw.decode("utf-8")
+    assert parser.fed is True
+
+    expected = GismeteoForecastParser()
+    expected.feed(data)
+    assert parser.close() == expected.close()
+
+    parser = GismeteoForecastParser()
+    async with ClientSession() as client:
+        gismeteo = GismeteoApiClient(
+            client,
+            latitude=LATITUDE,
+            longitude=LONGITUDE,
+            params={"parse_threshold": 1024},
+        )
+        data = await gismeteo._async_get_data("some_url", parser=parser)
+
+    assert data == raw.decode("utf-8")
+    assert parser.fed is False
+
+
+def test_forecast_parser():
+    """Test incremental parsing of forecast data."""
+    data = load_fixture("forecast.xml")
+
+    parser = GismeteoForecastParser()
+    parser.feed(data)
+    expected = parser.close()
+
+    parser = GismeteoForecastParser()
+    for i in range(0, len(data), 17):
+        parser.feed(data[i : i + 17])
+    assert parser.close() == expected
+
+    # Both hourly and daily forecasts are parsed at once
+    assert len(expected["forecast"][FORECAST_MODE_HOURLY]) == 16
+    assert len(expected["forecast"][FORECAST_MODE_DAILY]) == 7
+    assert expected["current"]["humidity"] == 86
+
+    parser = GismeteoForecastParser()
+    assert parser.fed is False
+    parser.feed(data[:500])
+    assert parser.fed is True
+    with raises(ApiError):
+        parser.close()
+
+    parser = GismeteoForecastParser()
+    parser.feed("<weather></weather>")
+    with raises(ApiError):
+        parser.close()
+
+
 async def test_async_get_location():
     """Test with valid location data."""
     with patch.object(
@@ -400,3 +489,833 @@ async def test_forecast():
                 "templow": 0,
             },
         ]
+
+
+async def test_fetch_broker():
+    """Test sharing of in-flight requests between clients."""
+    broker = GismeteoFetchBroker()
+
+    with patch.object(
+        GismeteoApiClient,
+        "_async_get_data",
+        return_value=load_fixture("forecast.xml"),
+    ) as mock_data:
+        async with ClientSession() as client:
+            clients = [
+                GismeteoApiClient(
+                    client,
+                    location_key=LOCATION_KEY,
+                    params={"timezone": "UTC", "broker": broker},
+                )
+                for _ in range(3)
+            ]
+            other = GismeteoApiClient(
+                client,
+                location_key=LOCATION_KEY + 1,
+                params={"timezone": "UTC", "broker": broker},
+            )
+
+            await asyncio.gather(*[x.async_update() for x in clients + [other]])
+
+    assert mock_data.call_count == 2
+    for gismeteo in clients:
+        assert gismeteo.current is clients[0].current
+    assert other.current == clients[0].current
+    assert other.current is not clients[0].current
+
+
+async def test_async_update_in_executor():
+    """Test parsing of large responses in executor."""
+    expected = await init_gismeteo()
+
+    with patch.object(
+        GismeteoApiClient,
+        "_async_get_data",
+        return_value=load_fixture("forecast.xml"),
+    ), ThreadPoolExecutor(max_workers=1) as executor, patch.object(
+        executor, "submit", wraps=executor.submit
+    ) as mock_submit:
+        async with ClientSession() as client:
+            gismeteo = GismeteoApiClient(
+                client,
+                location_key=LOCATION_KEY,
+                params={
+                    "timezone": "UTC",
+                    "parse_threshold": 1024,
+                    "parse_executor": executor,
+                },
+            )
+            assert await gismeteo.async_update() is True
+
+    assert mock_submit.call_count == 1
+    assert gismeteo.current == expected.current
+    assert gismeteo.forecast() == expected.forecast()
+
+
+async def test_forecast_cache():
+    """Test memoization of forecast between data updates."""
+    gismeteo = await init_gismeteo()
+    times = gismeteo._forecast_times[FORECAST_MODE_HOURLY]
+
+    with patch("time.time", return_value=times[2] - 1):
+        forecast = gismeteo.forecast()
+        assert gismeteo.forecast() is forecast
+
+    with patch("time.time", return_value=times[2] - 100):
+        assert gismeteo.forecast() is forecast
+
+    with patch("time.time", return_value=times[2] + 1):
+        assert gismeteo.forecast() is not forecast
+        assert gismeteo.forecast() == forecast[1:]
+
+        forecast = gismeteo.forecast()
+        with patch.object(
+            GismeteoApiClient,
+            "_async_get_data",
+            return_value=load_fixture("forecast.xml"),
+        ):
+            await gismeteo.async_update()
+
+        # Same data, so memoized forecast is kept
+        assert gismeteo.forecast() is forecast
+
+
+async def test_change_detection():
+    """Test skipping of unchanged data."""
+    gismeteo = await init_gismeteo()
+    current = gismeteo.current
+    snapshot = gismeteo.snapshot
+    revision = gismeteo.revision
+
+    with patch.object(
+        GismeteoApiClient,
+        "_async_get_data",
+        return_value=load_fixture("forecast.xml"),
+    ), patch("custom_components.gismeteo.api.parse_forecast") as mock_parse, patch(
+        "custom_components.gismeteo.api.GismeteoForecastParser.close"
+    ) as close:
+        assert await gismeteo.async_update() is True
+
+    mock_parse.assert_not_called()
+    close.assert_not_called()
+    assert gismeteo.current is current
+    assert gismeteo.snapshot is snapshot
+    assert gismeteo.revision == revision
+
+    data = load_fixture("forecast.xml").replace('t="-7"', 't="-8"', 1)
+    assert data != load_fixture("forecast.xml")
+    with patch.object(GismeteoApiClient, "_async_get_data", return_value=data):
+        await gismeteo.async_update()
+
+    assert gismeteo.current is not current
+    assert gismeteo.revision != revision
+
+    with patch(
+        "time.time", return_value=gismeteo._forecast_times[FORECAST_MODE_HOURLY][1] + 1
+    ):
+        assert gismeteo.revision != revision
+
+
+async def test_change_detection_streamed(socket_enabled, aiohttp_server):
+    """Test skipping of parsing of unchanged streamed data."""
+    bodies = [
+        load_fixture("forecast.xml"),
+        load_fixture("forecast.xml"),
+        load_fixture("forecast.xml").replace('tflt="-7"', 'tflt="-8"', 1),
+    ]
+
+    async def handler(request: web.Request):
+        return web.Response(text=bodies.pop(0), content_type="text/xml")
+
+    app = web.Application()
+    app.router.add_get("/forecast/", handler)
+    server = await aiohttp_server(app)
+
+    with patch("custom_components.gismeteo.api.ENDPOINT_URL", str(server.make_url(""))):
+        async with ClientSession() as client:
+            gismeteo = GismeteoApiClient(
+                client, location_key=167413, params={"timezone": "UTC"}
+            )
+            await gismeteo.async_update()
+            current = gismeteo.current
+
+            with patch.object(
+                GismeteoForecastParser,
+                "_parse_fact",
+                autospec=True,
+                side_effect=GismeteoForecastParser._parse_fact,
+            ) as parse_fact, patch(
+                "custom_components.gismeteo.api.parse_forecast", wraps=parse_forecast
+            ) as mock_parse:
+                # Identical body is not parsed
+                await gismeteo.async_update()
+                assert parse_fact.call_count == 0
+                assert mock_parse.call_count == 0
+                assert gismeteo.current is current
+
+                # Changed body with the same update time is parsed in full
+                await gismeteo.async_update()
+                assert mock_parse.call_count == 1
+                assert gismeteo.current is not current
+                assert gismeteo.current["temperature"] == -8
+
+
+async def test_condition_time_of_day():
+    """Test change of current condition at sunset."""
+    gismeteo = await init_gismeteo()
+    current = gismeteo.current
+    current[ATTR_WEATHER_CLOUDINESS] = 0
+    current[ATTR_WEATHER_STORM] = False
+    current[ATTR_WEATHER_PRECIPITATION_TYPE] = 0
+
+    with patch("time.time", return_value=current[ATTR_SUNSET] - 60):
+        assert gismeteo.condition() == ATTR_CONDITION_SUNNY
+        revision = gismeteo.revision
+    with patch("time.time", return_value=current[ATTR_SUNSET] + 60):
+        assert gismeteo.condition() == ATTR_CONDITION_CLEAR_NIGHT
+        assert gismeteo.revision != revision
+
+
+async def test_snapshot():
+    """Test precomputed current weather values."""
+    gismeteo = await init_gismeteo()
+    snapshot = gismeteo.snapshot
+
+    assert gismeteo.condition() == gismeteo.condition(gismeteo.current) == "snowy"
+    assert snapshot.temperature_feels_like == -12.3
+    assert snapshot.pressure_hpa == 994.6
+    assert snapshot.wind_bearing == 180
+    assert snapshot.clouds == 100
+    assert snapshot.rain == 0
+    assert snapshot.snow == 0.3
+    assert snapshot.storm is False
+    assert snapshot.geomagnetic == 3
+
+    with patch("math.exp") as mock_exp:
+        assert gismeteo.temperature_feels_like() == -12.3
+        assert mock_exp.call_count == 0
+
+    with raises(AttributeError):
+        snapshot.temperature = 0
+    with raises(AttributeError):
+        del snapshot.temperature
+    with raises(AttributeError):
+        snapshot.qwe = 0
+
+
+@patch("aiohttp.ClientSession.get")
+async def test_cache_parsed(mock_get, tmpdir):
+    """Test caching of parsed data."""
+    raw = {
+        "/cities/": load_fixture("location.xml").encode("utf-8"),
+        "/forecast/": load_fixture("forecast.xml").encode("utf-8"),
+    }
+
+    def mock_response(url, **kwargs):
+        resp = Mock()
+        resp.status = HTTPStatus.OK
+        data = raw["/cities/" if url.find("/cities/") >= 0 else "/forecast/"]
+
+        async def mock_text():
+            return data.decode("utf-8")
+
+        async def mock_chunks(size):
+            yield data
+
+        resp.text = mock_text
+        resp.content.iter_chunked = mock_chunks
+        resp.charset = "utf-8"
+        ctx = Mock()
+        ctx.__aenter__ = Mock(wraps=lambda: asyncio.sleep(0, resp))
+        ctx.__aexit__ = Mock(wraps=lambda *args: asyncio.sleep(0))
+        return ctx
+
+    mock_get.side_effect = mock_response
+    params = {
+        "timezone": "UTC",
+        "cache_dir": str(tmpdir),
+        "cache_time": 60,
+        "cache_parsed": True,
+    }
+
+    async with ClientSession() as client:
+        gismeteo = GismeteoApiClient(
+            client, latitude=LATITUDE, longitude=LONGITUDE, params=params
+        )
+        await gismeteo.async_get_location()
+        with patch.object(
+            Cache,
+            "async_read_cache_entry",
+            autospec=True,
+            side_effect=Cache.async_read_cache_entry,
+        ) as mock_read:
+            await gismeteo.async_update()
+
+    # Source data is not read again to save parsed data
+    assert [x.args[1] for x in mock_read.call_args_list].count(
+        "forecast_167413.xml"
+    ) == 1
+    assert (tmpdir / "forecast_167413.parsed").mtime() == (
+        tmpdir / "forecast_167413.xml"
+    ).mtime()
+    assert mock_get.call_count == 2
+    location_cell = geohash_encode(LATITUDE, LONGITUDE, LOCATION_CACHE_PRECISION)
+    assert sorted(tmpdir.listdir()) == sorted(
+        [
+            tmpdir / f"location_{location_cell}.xml",
+            tmpdir / f"location_{location_cell}.parsed",
+            tmpdir / "forecast_167413.xml",
+            tmpdir / "forecast_167413.parsed",
+        ]
+    )
+
+    # Parsed location is valid as long as cached location response
+    location_files = [
+        tmpdir / f"location_{location_cell}.xml",
+        tmpdir / f"location_{location_cell}.parsed",
+    ]
+    for file in location_files:
+        file.setmtime(file.mtime() - 600)
+
+    with patch.object(GismeteoForecastParser, "feed") as mock_feed, patch(
+        "xml.etree.ElementTree.fromstring"
+    ) as mock_fromstring:
+        async with ClientSession() as client:
+            warm = GismeteoApiClient(
+                client, latitude=LATITUDE, longitude=LONGITUDE, params=params
+            )
+            await warm.async_get_location()
+            await warm.async_update()
+
+        assert mock_feed.call_count == 0
+        assert mock_fromstring.call_count == 0
+
+    assert mock_get.call_count == 2
+    assert warm.attributes == gismeteo.attributes
+    assert warm.latitude == gismeteo.latitude
+    assert warm.current == gismeteo.current
+    assert warm.forecast() == gismeteo.forecast()
+
+    # Location parsed from cached response is saved again
+    location_files[1].remove()
+    for parse_count in (1, 0):
+        with patch(
+            "xml.etree.ElementTree.fromstring", wraps=etree.fromstring
+        ) as mock_fromstring:
+            async with ClientSession() as client:
+                warm = GismeteoApiClient(
+                    client, latitude=LATITUDE, longitude=LONGITUDE, params=params
+                )
+                await warm.async_get_location()
+        assert mock_fromstring.call_count == parse_count
+        assert location_files[1].mtime() == approx(location_files[0].mtime(), abs=1)
+        assert warm.location == gismeteo.location
+    assert mock_get.call_count == 2
+
+    with patch("custom_components.gismeteo.api.PARSED_CACHE_VERSION", 0), patch.object(
+        GismeteoForecastParser,
+        "feed",
+        autospec=True,
+        side_effect=GismeteoForecastParser.feed,
+    ) as mock_feed:
+        async with ClientSession() as client:
+            old = GismeteoApiClient(client, location_key=167413, params=params)
+            await old.async_update()
+        assert mock_feed.call_count > 0
+        assert old.current == gismeteo.current
+
+
+async def test_conditional_requests(socket_enabled, aiohttp_server, tmpdir):
+    """Test revalidation of cached data with conditional requests."""
+    requests = []
+
+    async def handler(request: web.Request):
+        requests.append(dict(request.headers))
+        if request.headers.get(hdrs.IF_NONE_MATCH) == '"v1"':
+            return web.Response(status=HTTPStatus.NOT_MODIFIED)
+        return web.Response(
+            text=load_fixture("forecast.xml"),
+            content_type="text/xml",
+            headers={
+                hdrs.ETAG: '"v1"',
+                hdrs.LAST_MODIFIED: "Sun, 21 Feb 2021 13:16:00 GMT",
+            },
+        )
+
+    app = web.Application()
+    app.router.add_get("/forecast/", handler)
+    server = await aiohttp_server(app)
+
+    params = {"timezone": "UTC", "cache_dir": str(tmpdir), "cache_time": 60}
+    cache_file = tmpdir / "forecast_167413.xml"
+
+    with patch("custom_components.gismeteo.api.ENDPOINT_URL", str(server.make_url(""))):
+        async with ClientSession() as client:
+            gismeteo = GismeteoApiClient(client, location_key=167413, params=params)
+            await gismeteo.async_update()
+
+            assert hdrs.IF_NONE_MATCH not in requests[0]
+            assert "gzip" in requests[0][hdrs.ACCEPT_ENCODING]
+            assert cache_file.exists()
+
+            # Expire cached data
+            mtime = cache_file.mtime() - 120
+            cache_file.setmtime(mtime)
+
+            await gismeteo.async_update()
+
+            assert requests[1][hdrs.IF_NONE_MATCH] == '"v1"'
+            assert (
+                requests[1][hdrs.IF_MODIFIED_SINCE] == "Sun, 21 Feb 2021 13:16:00 GMT"
+            )
+            assert cache_file.mtime() > mtime
+            assert gismeteo.current["humidity"] == 86
+
+            # Cached data is fresh again
+            await gismeteo.async_update()
+
+    assert len(requests) == 2
+
+
+async def test_streamed_response_without_charset(socket_enabled, aiohttp_server):
+    """Test decoding of streamed response without charset in content type."""
+
+    async def handler(request: web.Request):
+        return web.Response(
+            body=load_fixture("forecast.xml").encode("utf-8"),
+            headers={hdrs.CONTENT_TYPE: "text/xml"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/forecast/", handler)
+    server = await aiohttp_server(app)
+
+    with patch("custom_components.gismeteo.api.ENDPOINT_URL", str(server.make_url(""))):
+        async with ClientSession() as client:
+            gismeteo = GismeteoApiClient(
+                client, location_key=167413, params={"timezone": "UTC"}
+            )
+            await gismeteo.async_update()
+
+    assert gismeteo.current
+    assert gismeteo.forecast()
+
+
+async def test_retries(socket_enabled, aiohttp_server, tmpdir):
+    """Test retries of failed requests and serving of stale data."""
+    responses = []
+    requests = []
+
+    async def handler(request: web.Request):
+        requests.append(request.path)
+        return responses.pop(0)
+
+    app = web.Application()
+    app.router.add_get("/forecast/", handler)
+    server = await aiohttp_server(app)
+    url = str(server.make_url("/forecast/"))
+
+    params = {"timezone": "UTC", "cache_dir": str(tmpdir), "cache_time": 60}
+    breaker = GismeteoCircuitBreaker(failure_threshold=2)
+    params["circuit_breaker"] = breaker
+    delays = []
+
+    async def mock_sleep(delay):
+        delays.append(delay)
+
+    with patch("asyncio.sleep", side_effect=mock_sleep):
+        async with ClientSession() as client:
+            gismeteo = GismeteoApiClient(client, location_key=167413, params=params)
+
+            # Transient errors are retried with growing delays
+            responses[:] = [
+                web.Response(status=HTTPStatus.SERVICE_UNAVAILABLE),
+                web.Response(status=HTTPStatus.BAD_GATEWAY),
+                web.Response(text="qwe"),
+            ]
+            assert await gismeteo._async_get_data(url, "test", 3600) == "qwe"
+            assert len(requests) == 3
+            assert 0.25 <= delays[0] <= 0.5 and 0.5 <= delays[1] <= 1
+
+            # Retry-After is honored
+            delays.clear()
+            responses[:] = [
+                web.Response(
+                    status=HTTPStatus.TOO_MANY_REQUESTS,
+                    headers={hdrs.RETRY_AFTER: "2"},
+                ),
+                web.Response(text="asd"),
+            ]
+            assert await gismeteo._async_get_data(url) == "asd"
+            assert delays == [2]
+
+            # Other errors are not retried
+            requests.clear()
+            responses[:] = [web.Response(status=HTTPStatus.NOT_FOUND)]
+            assert await gismeteo._async_get_data(url) is None
+            assert len(requests) == 1
+
+            # Stale data is used when retries are exhausted
+            requests.clear()
+            responses[:] = [
+                web.Response(status=HTTPStatus.INTERNAL_SERVER_ERROR)
+                for _ in range(RETRY_ATTEMPTS)
+            ]
+            (tmpdir / "test.xml").setmtime((tmpdir / "test.xml").mtime() - 120)
+            assert await gismeteo._async_get_data(url, "test", 3600) == "qwe"
+            assert len(requests) == RETRY_ATTEMPTS
+            assert not breaker.is_open(server.host)
+
+            # Too long delay is not waited
+            requests.clear()
+            responses[:] = [
+                web.Response(
+                    status=HTTPStatus.SERVICE_UNAVAILABLE,
+                    headers={hdrs.RETRY_AFTER: "600"},
+                )
+            ]
+            assert await gismeteo._async_get_data(url, "test", 3600) == "qwe"
+            assert len(requests) == 1
+            assert breaker.is_open(server.host)
+
+            # Requests are suspended while circuit is open
+            requests.clear()
+            assert await gismeteo._async_get_data(url, "test", 3600) == "qwe"
+            with raises(ApiError):
+                await gismeteo._async_get_data(url)
+            assert not requests
+
+
+async def test_stale_data_after_broken_stream(socket_enabled, aiohttp_server, tmpdir):
+    """Test using stale data when response breaks after parsing started."""
+    body = load_fixture("forecast.xml").encode("utf-8")
+    broken = False
+
+    async def handler(request: web.Request):
+        if not broken:
+            return web.Response(body=body, content_type="text/xml")
+
+        resp = web.StreamResponse(headers={hdrs.CONTENT_LENGTH: str(len(body))})
+        await resp.prepare(request)
+        await resp.write(body[: len(body) // 2])
+        request.transport.close()
+        return resp
+
+    app = web.Application()
+    app.router.add_get("/forecast/", handler)
+    server = await aiohttp_server(app)
+
+    params = {"timezone": "UTC", "cache_dir": str(tmpdir), "cache_time": 60}
+    cache_file = tmpdir / "forecast_167413.xml"
+
+    async def mock_sleep(delay):
+        pass
+
+    with patch(
+        "custom_components.gismeteo.api.ENDPOINT_URL", str(server.make_url(""))
+    ), patch("asyncio.sleep", side_effect=mock_sleep):
+        async with ClientSession() as client:
+            gismeteo = GismeteoApiClient(client, location_key=167413, params=params)
+            await gismeteo.async_update()
+            current = gismeteo.current
+
+            cache_file.setmtime(cache_file.mtime() - 120)
+            broken = True
+            gismeteo = GismeteoApiClient(client, location_key=167413, params=params)
+            assert await gismeteo.async_update() is True
+            assert gismeteo.current == current
+
+
+def test_circuit_breaker():
+    """Test suspending of requests to failing hosts."""
+    breaker = GismeteoCircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    with patch("time.monotonic", return_value=1000):
+        breaker.record_failure("host")
+        assert breaker.allow_request("host")
+        assert breaker.allow_request("other")
+
+        breaker.record_failure("host")
+        assert breaker.is_open("host")
+        assert not breaker.allow_request("host")
+        assert breaker.allow_request("other")
+
+    with patch("time.monotonic", return_value=1061):
+        # Only one trial request is let through
+        assert breaker.allow_request("host")
+        assert not breaker.allow_request("host")
+
+        breaker.record_failure("host")
+        assert not breaker.allow_request("host")
+
+    with patch("time.monotonic", return_value=1122):
+        assert breaker.allow_request("host")
+        breaker.record_success("host")
+        assert not breaker.is_open("host")
+        assert breaker.allow_request("host")
+
+        breaker.record_failure("host")
+        assert breaker.allow_request("host")
+
+
+async def test_stale_while_revalidate(socket_enabled, aiohttp_server, tmpdir):
+    """Test serving of stale data while it is refreshed in background."""
+    data = load_fixture("forecast.xml")
+    requests = []
+    release = asyncio.Event()
+
+    async def handler(request: web.Request):
+        requests.append(request.path)
+        if len(requests) > 1:
+            await release.wait()
+        return web.Response(text=data, content_type="text/xml")
+
+    app = web.Application()
+    app.router.add_get("/forecast/", handler)
+    server = await aiohttp_server(app)
+
+    params = {
+        "timezone": "UTC",
+        "cache_dir": str(tmpdir),
+        "cache_time": 60,
+        "stale_while_revalidate": True,
+    }
+    cache_file = tmpdir / "forecast_167413.xml"
+
+    with patch("custom_components.gismeteo.api.ENDPOINT_URL", str(server.make_url(""))):
+        async with ClientSession() as client:
+            gismeteo = GismeteoApiClient(client, location_key=167413, params=params)
+            await gismeteo.async_update()
+            assert not gismeteo.revalidations
+            current = gismeteo.current
+
+            # Expire cached data
+            mtime = cache_file.mtime() - 120
+            cache_file.setmtime(mtime)
+            data = data.replace('t="-7"', 't="-8"', 1)
+
+            await gismeteo.async_update()
+            assert gismeteo.current is current
+            assert len(gismeteo.revalidations) == 1
+
+            # Only one refresh is started
+            await gismeteo.async_update()
+            assert len(gismeteo.revalidations) == 1
+
+            release.set()
+            assert await gismeteo.revalidations[0] is True
+            assert not gismeteo.revalidations
+            assert len(requests) == 2
+            assert cache_file.mtime() > mtime
+
+            await gismeteo.async_update()
+            assert gismeteo.current is not current
+
+
+async def test_shared_revalidation(socket_enabled, aiohttp_server, tmpdir):
+    """Test watching of background refresh by all clients of fetch broker."""
+    data = load_fixture("forecast.xml")
+    requests = []
+    release = asyncio.Event()
+
+    async def handler(request: web.Request):
+        requests.append(request.path)
+        if len(requests) > 1:
+            await release.wait()
+        return web.Response(text=data, content_type="text/xml")
+
+    app = web.Application()
+    app.router.add_get("/forecast/", handler)
+    server = await aiohttp_server(app)
+
+    params = {
+        "timezone": "UTC",
+        "cache_dir": str(tmpdir),
+        "cache_time": 60,
+        "stale_while_revalidate": True,
+        "broker": GismeteoFetchBroker(),
+    }
+    cache_file = tmpdir / "forecast_167413.xml"
+
+    with patch("custom_components.gismeteo.api.ENDPOINT_URL", str(server.make_url(""))):
+        async with ClientSession() as client:
+            clients = [
+                GismeteoApiClient(client, location_key=167413, params=params)
+                for _ in range(2)
+            ]
+            await clients[0].async_update()
+
+            # Expire cached data
+            cache_file.setmtime(cache_file.mtime() - 120)
+
+            await asyncio.gather(*[x.async_update() for x in clients])
+            assert len(clients[0].revalidations) == 1
+            assert clients[1].revalidations == clients[0].revalidations
+
+            # Client which did not join the fetch does not start another refresh
+            await clients[1].async_update()
+            assert clients[1].revalidations == clients[0].revalidations
+
+            release.set()
+            assert await clients[1].revalidations[0] is True
+            assert len(requests) == 2
+            for gismeteo in clients:
+                assert not gismeteo.revalidations
+
+
+async def test_location_cache_keys(tmpdir):
+    """Test sharing of cached locations by nearby coordinates."""
+    params = {"timezone": "UTC", "cache_dir": str(tmpdir), "location_precision": 5}
+    height, width = geohash_cell_size(5)
+
+    with patch("aiohttp.ClientSession.get") as mock_get:
+        mock_resp = mock_get.return_value.__aenter__.return_value
+        mock_resp.status = HTTPStatus.OK
+        mock_resp.headers = {}
+        mock_resp.text = Mock(
+            wraps=lambda: asyncio.sleep(0, load_fixture("location.xml"))
+        )
+
+        async with ClientSession() as client:
+            for lat, lon in (
+                (LATITUDE, LONGITUDE),
+                (LATITUDE + height / 10, LONGITUDE - width / 10),
+                (LATITUDE + height, LONGITUDE),
+                (LATITUDE - height, LONGITUDE + width),
+            ):
+                gismeteo = GismeteoApiClient(
+                    client, latitude=lat, longitude=lon, params=params
+                )
+                await gismeteo.async_get_location()
+                assert gismeteo.attributes[ATTR_ID] == 167413
+
+            gismeteo = GismeteoApiClient(
+                client,
+                latitude=LATITUDE + 3 * height,
+                longitude=LONGITUDE,
+                params=params,
+            )
+            await gismeteo.async_get_location()
+
+    # Only areas which are not neighbors of cached ones are requested
+    assert mock_get.call_count == 2
+
+
+async def test_forecast_views():
+    """Test hourly and daily views of the same forecast data."""
+    gismeteo = await init_gismeteo()
+    gismeteo_d = await init_gismeteo(FORECAST_MODE_DAILY)
+
+    assert gismeteo.forecast() is gismeteo.forecast(mode=FORECAST_MODE_HOURLY)
+    assert gismeteo.forecast(mode=FORECAST_MODE_DAILY) == gismeteo_d.forecast()
+    assert gismeteo_d.forecast(mode=FORECAST_MODE_HOURLY) == gismeteo.forecast()
+
+
+async def test_forecast_modes_shared():
+    """Test single request for clients of the same city in different modes."""
+    broker = GismeteoFetchBroker()
+    params = {"timezone": "UTC", "broker": broker}
+
+    with patch.object(
+        GismeteoApiClient,
+        "_async_get_data",
+        return_value=load_fixture("forecast.xml"),
+    ) as get_data:
+        async with ClientSession() as client:
+            clients = [
+                GismeteoApiClient(
+                    client, location_key=LOCATION_KEY, mode=mode, params=params
+                )
+                for mode in (FORECAST_MODE_HOURLY, FORECAST_MODE_DAILY)
+            ]
+            await asyncio.gather(*(x.async_update() for x in clients))
+
+    assert get_data.call_count == 1
+    assert clients[0].forecast(mode=FORECAST_MODE_DAILY) == clients[1].forecast()
+
+
+async def test_multi_client():
+    """Test update of many cities at once."""
+    data = load_fixture("forecast.xml")
+    active = 0
+    max_active = 0
+
+    async def mock_data(self, url, *args, **kwargs):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        if "city=13" in url:
+            raise ApiError("Test error")
+        return data
+
+    with patch.object(
+        GismeteoApiClient, "_async_get_data", autospec=True, side_effect=mock_data
+    ), ThreadPoolExecutor(2) as executor, patch(
+        "custom_components.gismeteo.api.parse_forecast", wraps=parse_forecast
+    ) as mock_parse:
+        async with ClientSession() as client:
+            multi = GismeteoMultiClient(
+                client,
+                params={"timezone": "UTC", "parse_executor": executor},
+                concurrency=3,
+            )
+            results = await multi.async_update_many(range(1, 21))
+
+            assert list(results) == list(range(1, 21))
+            assert isinstance(results[13], ApiError)
+            assert results[1] is multi.client(1)
+            assert results[20].current["humidity"] == 86
+            assert max_active == 3
+            assert mock_parse.call_count == 19
+
+            # Clients are reused
+            results = await multi.async_update_many([1, 1, 2])
+            assert list(results) == [1, 2]
+            assert results[1] is multi.client(1)
+
+
+async def test_connection_stats(socket_enabled, aiohttp_server):
+    """Test collecting of connection statistics."""
+
+    async def handler(request: web.Request):
+        return web.Response(text="OK")
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    server = await aiohttp_server(app)
+    # Address literals are not resolved, so use host name
+    url = f"http://localhost:{server.port}/"
+
+    stats = GismeteoConnectionStats()
+    async with ClientSession(trace_configs=[stats.trace_config()]) as client:
+        for _ in range(3):
+            async with client.get(url) as resp:
+                assert await resp.text() == "OK"
+
+    assert stats.stats == {
+        "requests": 3,
+        "connections_created": 1,
+        "connections_reused": 2,
+        "dns_cache_hits": 0,
+        "dns_cache_misses": 1,
+    }
+
+
+async def test_cache_time(tmpdir):
+    """Test changing of cache time."""
+    async with ClientSession() as client:
+        gismeteo = GismeteoApiClient(client, location_key=167413)
+        assert gismeteo.cache_time is None
+        gismeteo.cache_time = 60
+
+        gismeteo = GismeteoApiClient(
+            client,
+            location_key=167413,
+            params={"cache_dir": str(tmpdir), "cache_time": 300},
+        )
+        assert gismeteo.cache_time == 300
+        gismeteo.cache_time = 60
+        assert gismeteo._cache.is_fresh(59) is True
+        assert gismeteo._cache.is_fresh(61) is False
@@ -5,10 +5,18 @@
 import os
 import random
 from time import time
+from unittest.mock import patch
 
 import pytest
 
-from custom_components.gismeteo.cache import Cache
+from custom_components.gismeteo.cache import (
+    COMPRESS_MIN_SIZE,
+    TEMP_FILE_PREFIX,
+    Cache,
+    MemoryCache,
+    decompress,
+    read_file,
+)
 
 
 @pytest.fixture()
@@ -52,14 +60,21 @@ def cache_dir(config):
     return res
 
 
-def test__clean_dir(config, cache_dir):
+def test_cleanup_expired(config, cache_dir):
     """Cache controller tests."""
     assert len(os.listdir(config["cache_dir"])) == len(cache_dir["old"]) + len(
         cache_dir["new"]
     )
 
-    config["clean_dir"] = True
-    Cache(config)
+    # Directory is not cleaned on initialization
+    with pytest.raises(ValueError):
+        Cache({**config, "clean_dir": True})
+    cache = Cache(config)
+    assert len(os.listdir(config["cache_dir"])) == len(cache_dir["old"]) + len(
+        cache_dir["new"]
+    )
+
+    cache.cleanup()
 
     assert len(os.listdir(config["cache_dir"])) == len(cache_dir["new"])
 
@@ -139,3 +154,237 @@ def test_save_cache(config):
         cache.save_cache(file_name, content)
 
         assert cache.read_cache(file_name) == content
+
+
+def test_read_cache_entry(config, cache_dir):
+    """Cache controller tests."""
+    cache = Cache(config)
+
+    for i in cache_dir["old"].keys():
+        content, age = cache.read_cache_entry(i)
+        assert content is None
+        assert age >= 60
+        assert cache.is_fresh(age) is False
+        assert cache.read_cache_entry(i, age + 10)[0] == cache_dir["old"][i]
+
+    for i, con in cache_dir["new"].items():
+        content, age = cache.read_cache_entry(i)
+        assert content == con
+        assert 0 <= age < 60
+        assert cache.is_fresh(age) is True
+
+    assert cache.read_cache_entry(os.urandom(3).hex()) == (None, None)
+    assert cache.is_fresh(None) is False
+
+
+def test_save_cache_atomic(config):
+    """Cache controller tests."""
+    cache = Cache(config)
+    cache.save_cache("file_name", "old")
+
+    with patch("os.replace", side_effect=OSError), pytest.raises(OSError):
+        cache.save_cache("file_name", "new")
+
+    assert cache.read_cache("file_name") == "old"
+    assert os.listdir(config["cache_dir"]) == ["file_name"]
+
+
+async def test_async_cache(config):
+    """Cache controller tests."""
+    config["cache_dir"] = os.path.join(config["cache_dir"], os.urandom(3).hex())
+    cache = Cache(config)
+
+    assert await cache.async_read_cache_entry("file_name") == (None, None)
+
+    await cache.async_save_cache("file_name", "content")
+
+    content, age = await cache.async_read_cache_entry("file_name")
+    assert content == "content"
+    assert cache.is_fresh(age) is True
+
+
+def test_memory_cache():
+    """Cache controller tests."""
+    memory = MemoryCache(max_entries=3, max_size=10, ttl=300)
+    now = time()
+
+    assert memory.get("a", 60) is None
+    memory.put("a", "aaa", now)
+    memory.put("b", "bbb", now - 100)
+    memory.put("c", "ccc", now - 400)
+    assert memory.get("a", 60) == ("aaa", now)
+    assert memory.get("b", 60) is None  # too old for caller, but kept
+    assert memory.get("b", 3600) == ("bbb", now - 100)
+    assert memory.get("c", 3600) is None  # expired
+    assert memory.stats == {
+        "entries": 2,
+        "size": 6,
+        "hits": 2,
+        "misses": 3,
+        "evictions": 1,
+    }
+    memory.discard("b")
+
+    memory.put("b", "bbb", now)
+    memory.put("c", "ccc", now)
+    memory.get("a", 60)
+    memory.put("d", "d", now)  # evicts "b" by entries limit
+    assert memory.get("b", 60) is None
+    memory.put("e", "eeeeeee", now)  # evicts "c" and "a" by size limit
+    assert memory.get("c", 60) is None
+    assert memory.get("a", 60) is None
+    assert memory.get("d", 60) == ("d", now)
+    assert memory.stats["size"] == 8
+
+    memory.put("f", "f" * 11, now)  # too big
+    assert memory.get("f", 60) is None
+    memory.discard("d")
+    assert memory.get("d", 60) is None
+
+
+async def test_cache_memory_tier(config, cache_dir):
+    """Cache controller tests."""
+    config["memory_cache"] = MemoryCache()
+    cache = Cache(config)
+    other = Cache(config)
+
+    for i, con in cache_dir["new"].items():
+        assert cache.read_cache(i) == con
+
+    with patch("builtins.open", side_effect=AssertionError):
+        for i, con in cache_dir["new"].items():
+            assert cache.read_cache(i) == con
+            assert (await other.async_read_cache_entry(i))[0] == con
+
+    cache.save_cache("file_name", "content")
+    with patch("builtins.open", side_effect=AssertionError):
+        assert other.read_cache("file_name") == "content"
+
+    for i in cache_dir["old"].keys():
+        assert cache.read_cache(i) is None
+
+    stats = config["memory_cache"].stats
+    assert stats["hits"] == 2 * len(cache_dir["new"]) + 1
+    assert stats["misses"] == len(cache_dir["new"]) + len(cache_dir["old"])
+
+    # Reading with short window does not evict entry usable by others
+    cache.save_cache("stale", "content", time() - 100)
+    assert cache.read_cache("stale") is None
+    with patch("builtins.open", side_effect=AssertionError):
+        assert other.read_cache_entry("stale", 3600)[0] == "content"
+
+
+def test_binary_cache(config):
+    """Cache controller tests."""
+    cache = Cache(config)
+    content = os.urandom(16)
+    mtime = time() - 30
+
+    cache.save_cache("file_name", content, mtime)
+
+    data, age = cache.read_cache_entry("file_name", binary=True)
+    assert data == content
+    assert 30 <= age < 35
+    assert os.path.getmtime(cache._get_file_path("file_name")) == mtime
+
+
+def test_compressed_cache(config):
+    """Cache controller tests."""
+    config["cache_compression"] = "gzip"
+    cache = Cache(config)
+    content = "<xml>" + "content " * COMPRESS_MIN_SIZE + "</xml>"
+
+    cache.save_cache("file_name", content)
+    file_path = cache._get_file_path("file_name")
+    with open(file_path, "rb") as fp:
+        data = fp.read()
+    assert data[:2] == b"\x1f\x8b"
+    assert len(data) < len(content)
+    assert decompress(data) == content.encode()
+    assert read_file(file_path) == content
+    assert cache.read_cache("file_name") == content
+
+    # Short content is not compressed
+    cache.save_cache("short", "content")
+    assert read_file(cache._get_file_path("short"), binary=True) == b"content"
+    assert cache.read_cache("short") == "content"
+
+    # Uncompressed files are still readable
+    assert Cache({**config, "cache_compression": None}).read_cache("file_name") == (
+        content
+    )
+
+    with open(file_path, "wb") as fp:
+        fp.write(data[:-8])
+    assert cache.read_cache_entry("file_name") == (None, None)
+
+
+def test_zstd_fallback(config):
+    """Cache controller tests."""
+    config["cache_compression"] = "zstd"
+    with patch("custom_components.gismeteo.cache.zstandard", None):
+        cache = Cache(config)
+        cache.save_cache("file_name", "content " * COMPRESS_MIN_SIZE)
+
+        with open(cache._get_file_path("file_name"), "rb") as fp:
+            assert fp.read(2) == b"\x1f\x8b"
+        with pytest.raises(ValueError):
+            decompress(b"\x28\xb5\x2f\xfd" + b"content")
+
+
+def test_cleanup(config):
+    """Cache controller tests."""
+    memory = MemoryCache()
+    cache = Cache({**config, "cache_time": 0, "memory_cache": memory})
+    now = time()
+
+    for i in range(6):
+        cache.save_cache(f"forecast_{i}.xml", "x" * 100)
+        mtime = now - 60 * (6 - i)
+        os.utime(cache._get_file_path(f"forecast_{i}.xml"), (mtime, mtime))
+    cache.save_cache("other.json", "x" * 100)
+    os.utime(cache._get_file_path("other.json"), (1, 1))
+    # Temporary files left after crash
+    for file_name, mtime in ((".tmp_old.tmp", now - 300), (".tmp_new.tmp", now)):
+        with open(cache._get_file_path(file_name), "w", encoding="utf-8") as fp:
+            fp.write("x" * 1000)
+        os.utime(cache._get_file_path(file_name), (mtime, mtime))
+
+    # Recently read file is not evicted
+    atime = now - 5
+    os.utime(cache._get_file_path("forecast_0.xml"), (atime, now - 200))
+
+    stats = cache.cleanup(
+        250, max_size=1350, max_entries=10, prefixes=("forecast_", TEMP_FILE_PREFIX)
+    )
+    assert stats == {
+        "entries": 4,
+        "size": 1300,
+        "expired": 2,
+        "evicted": 2,
+        "freed": 1300,
+    }
+    assert sorted(os.listdir(config["cache_dir"])) == [
+        ".tmp_new.tmp",
+        "forecast_0.xml",
+        "forecast_4.xml",
+        "forecast_5.xml",
+        "other.json",
+    ]
+    assert memory.stats["entries"] == 4
+
+    stats = cache.cleanup(1000, max_entries=1, prefixes=("forecast_",))
+    assert stats["entries"] == 1
+    assert stats["evicted"] == 2
+    assert os.path.exists(cache._get_file_path("forecast_0.xml"))
+
+    # Temporary file being written is not evicted
+    assert cache.cleanup(1000, max_entries=0, prefixes=(TEMP_FILE_PREFIX,)) == {
+        "entries": 1,
+        "size": 1000,
+        "expired": 0,
+        "evicted": 0,
+        "freed": 0,
+    }
+
+    assert Cache({"cache_dir": "/not/exists"}).cleanup()["entries"] == 0
@@ -7,6 +7,7 @@ import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 from custom_components.gismeteo.const import (
+    CONF_DEDICATED_SESSION,
     CONF_FORECAST,
     DOMAIN,
     FORECAST_MODE_DAILY,
@@ -125,4 +126,5 @@ async def test_options_flow(hass: HomeAssistant):
         CONF_MODE: FORECAST_MODE_DAILY,
         CONF_FORECAST: True,
         CONF_SHOW_ON_MAP: False,
+        CONF_DEDICATED_SESSION: False,
     }
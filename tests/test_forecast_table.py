@@ -0,0 +1,142 @@
+"""Tests for forecast table."""
+import itertools
+import pickle
+from unittest.mock import patch
+
+from pytest import raises
+from pytest_homeassistant_custom_component.common import load_fixture
+
+from custom_components.gismeteo.api import GismeteoApiClient, GismeteoForecastParser
+from custom_components.gismeteo.const import (
+    ATTR_FORECAST_CLOUDINESS,
+    ATTR_FORECAST_PHENOMENON,
+    ATTR_FORECAST_PRECIPITATION_AMOUNT,
+    ATTR_FORECAST_PRECIPITATION_INTENSITY,
+    ATTR_FORECAST_PRECIPITATION_TYPE,
+    ATTR_FORECAST_STORM,
+    ATTR_SUNRISE,
+    ATTR_SUNSET,
+    FORECAST_MODE_DAILY,
+    FORECAST_MODE_HOURLY,
+)
+from custom_components.gismeteo.forecast_table import (
+    ForecastRow,
+    ForecastTable,
+    batch_conditions,
+)
+from homeassistant.components.weather import (
+    ATTR_FORECAST_CONDITION,
+    ATTR_FORECAST_TEMP,
+    ATTR_FORECAST_TIME,
+    ATTR_FORECAST_WIND_SPEED,
+)
+
+ROWS = [
+    {
+        ATTR_FORECAST_TIME: 1613854800.0,
+        ATTR_FORECAST_CONDITION: "Cloudy",
+        ATTR_FORECAST_TEMP: -10,
+        ATTR_FORECAST_CLOUDINESS: 3,
+        ATTR_FORECAST_PRECIPITATION_AMOUNT: 0.2,
+        ATTR_FORECAST_STORM: False,
+        "extra": [1, 2],
+    },
+    {
+        ATTR_FORECAST_TIME: 1613865600.0,
+        ATTR_FORECAST_CONDITION: None,
+        ATTR_FORECAST_TEMP: None,
+        ATTR_FORECAST_CLOUDINESS: 0,
+        ATTR_FORECAST_PRECIPITATION_AMOUNT: None,
+        ATTR_FORECAST_STORM: None,
+        "extra": None,
+    },
+]
+
+
+def test_forecast_table():
+    """Test storing and reading of forecast rows."""
+    table = ForecastTable(ROWS)
+
+    assert len(table) == 2
+    assert table.keys == list(ROWS[0])
+    assert [dict(x) for x in table] == ROWS
+    assert isinstance(table[0], ForecastRow)
+    assert table[-1] == ROWS[1]
+    assert table[0:1] == [ROWS[0]]
+    assert table[0].get("unknown") is None
+    assert isinstance(table[0][ATTR_FORECAST_TEMP], int)
+    assert isinstance(table[0][ATTR_FORECAST_STORM], bool)
+
+    with raises(IndexError):
+        table[2]  # pylint: disable=pointless-statement
+    with raises(KeyError):
+        table[0]["unknown"]  # pylint: disable=pointless-statement
+
+    assert list(table.column(ATTR_FORECAST_CLOUDINESS)) == [3, 0]
+    assert table.column(ATTR_FORECAST_CLOUDINESS).sum() == 3
+
+    assert table == ForecastTable(ROWS)
+    assert table != ForecastTable(ROWS[:1])
+    assert pickle.loads(pickle.dumps(table)) == table
+    assert not ForecastTable()
+
+
+def test_forecast_table_parsed():
+    """Test forecast table filled by parser."""
+    parser = GismeteoForecastParser()
+    parser.feed(load_fixture("forecast.xml"))
+    forecasts = parser.close()["forecast"]
+
+    for mode in (FORECAST_MODE_HOURLY, FORECAST_MODE_DAILY):
+        forecast = forecasts[mode]
+        assert isinstance(forecast, ForecastTable)
+        assert ForecastTable([dict(x) for x in forecast]) == forecast
+
+
+def _assert_conditions_parity(table: ForecastTable, mode: str):
+    """Compare batch and scalar conditions classification."""
+    gismeteo = GismeteoApiClient(None, location_key=1, mode=mode)
+    expected = [gismeteo.condition(x) for x in table]
+    daily = mode == FORECAST_MODE_DAILY
+
+    assert batch_conditions(table, daily) == expected
+    with patch("custom_components.gismeteo.forecast_table.np", None):
+        assert batch_conditions(table, daily) == expected
+
+
+def test_batch_conditions():
+    """Test batch conditions classification."""
+    parser = GismeteoForecastParser()
+    parser.feed(load_fixture("forecast.xml"))
+    forecasts = parser.close()["forecast"]
+    for mode in (FORECAST_MODE_HOURLY, FORECAST_MODE_DAILY):
+        _assert_conditions_parity(forecasts[mode], mode)
+
+    rows = [
+        {
+            ATTR_SUNRISE: 1000,
+            ATTR_SUNSET: 2000,
+            ATTR_FORECAST_TIME: fc_time,
+            ATTR_FORECAST_CLOUDINESS: cld,
+            ATTR_FORECAST_PRECIPITATION_TYPE: pr_type,
+            ATTR_FORECAST_PRECIPITATION_INTENSITY: pr_int,
+            ATTR_FORECAST_STORM: storm,
+            ATTR_FORECAST_WIND_SPEED: wind,
+            ATTR_FORECAST_PHENOMENON: phenomenon,
+        }
+        for fc_time, cld, pr_type, pr_int, storm, wind, phenomenon in (
+            itertools.product(
+                (500, 1500),
+                (None, 0, 1, 2, 3),
+                (None, 0, 1, 2, 3),
+                (0, 3),
+                (False, True),
+                (0, 11),
+                (None, 11, 71),
+            )
+        )
+    ]
+    for mode in (FORECAST_MODE_HOURLY, FORECAST_MODE_DAILY):
+        _assert_conditions_parity(ForecastTable(rows), mode)
+
+    assert batch_conditions(ForecastTable()) == []
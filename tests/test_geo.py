@@ -0,0 +1,130 @@
+"""Tests for geographic helpers."""
+import json
+from unittest.mock import patch
+
+from aiohttp import ClientSession
+from pytest import approx
+from pytest_homeassistant_custom_component.common import load_fixture
+
+from custom_components.gismeteo.api import GismeteoApiClient
+from custom_components.gismeteo.geo import (
+    CityIndex,
+    distance,
+    geohash_cell_size,
+    geohash_encode,
+    geohash_neighbors,
+    parse_cities,
+    read_cached_cities,
+)
+from homeassistant.const import ATTR_ID, ATTR_LATITUDE, ATTR_LONGITUDE, ATTR_NAME
+
+
+def test_geohash():
+    """Test geohash helpers."""
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash_encode(57.64911, 10.40744, 5) == "u4pru"
+    assert geohash_cell_size(5) == (180 / 2**12, 360 / 2**13)
+
+    cells = geohash_neighbors(57.64911, 10.40744, 5)
+    assert len(cells) == 9
+    assert cells[0] == "u4pru"
+
+    # Cells beyond the pole do not exist
+    assert len(geohash_neighbors(89.99, 10, 5)) == 6
+    # Cells across the antimeridian
+    assert set(geohash_neighbors(0, 179.99, 5)) >= {geohash_encode(0, -179.99, 5)}
+
+
+def test_distance():
+    """Test distance calculation."""
+    assert distance(55.75, 37.62, 55.75, 37.62) == 0
+    assert distance(55.75, 37.62, 59.94, 30.31) == approx(635, abs=1)
+
+
+def test_city_index(tmpdir):
+    """Test nearest city search."""
+    index = CityIndex()
+    index.add_many(
+        [
+            {ATTR_ID: 1, ATTR_NAME: "A", ATTR_LATITUDE: 55.75, ATTR_LONGITUDE: 37.62},
+            {ATTR_ID: 2, ATTR_NAME: "B", ATTR_LATITUDE: 55.77, ATTR_LONGITUDE: 37.62},
+            {ATTR_ID: 3, ATTR_NAME: "C", ATTR_LATITUDE: None, ATTR_LONGITUDE: 37},
+        ]
+    )
+    assert len(index) == 2
+
+    assert index.nearest(55.751, 37.62)[ATTR_ID] == 1
+    assert index.nearest(55.769, 37.62)[ATTR_ID] == 2
+    assert index.nearest(55.76, 37.66)[ATTR_ID] in (1, 2)
+    assert index.nearest(55.9, 37.62) is None
+    assert index.nearest(55.9, 37.62, max_distance=100) is None
+
+    # Results can't change index
+    index.nearest(55.751, 37.62)[ATTR_NAME] = "X"
+    assert index.nearest(55.751, 37.62)[ATTR_NAME] == "A"
+
+    (tmpdir / "location_55.59_-162.26.xml").write(load_fixture("location.xml"))
+    (tmpdir / "location_1_2.xml").write("qwe")
+    index.add_many(read_cached_cities(str(tmpdir)))
+    assert len(index) == 3
+    assert index.nearest(55.59, -162.26)[ATTR_NAME] == "Razvilka"
+
+    dump = tmpdir / "cities.json"
+    dump.write(
+        json.dumps(
+            [
+                {"id": "4", "n": "D", "lat": "10.5", "lng": "20.5"},
+                {"id": "5", "n": "E", "lat": "qwe", "lng": "20.5"},
+                {"n": "F", "lat": "11.5", "lng": "20.5"},
+            ]
+        )
+    )
+    index.load_dump(str(dump))
+    index.load_dump(str(tmpdir / "none.json"))
+    assert len(index) == 4
+    assert index.nearest(10.5, 20.5) == {
+        ATTR_ID: 4,
+        ATTR_NAME: "D",
+        ATTR_LATITUDE: 10.5,
+        ATTR_LONGITUDE: 20.5,
+    }
+
+
+def test_parse_cities():
+    """Test parsing of location response."""
+    assert parse_cities(load_fixture("location.xml")) == [
+        {
+            ATTR_ID: 167413,
+            ATTR_NAME: "Razvilka",
+            ATTR_LATITUDE: 55.5914,
+            ATTR_LONGITUDE: approx(-162.256302),
+        }
+    ]
+
+
+async def test_location_from_index():
+    """Test resolving of location by city index."""
+    index = CityIndex()
+    params = {"timezone": "UTC", "city_index": index}
+
+    with patch.object(
+        GismeteoApiClient,
+        "_async_get_data",
+        return_value=load_fixture("location.xml"),
+    ) as get_data:
+        async with ClientSession() as client:
+            gismeteo = GismeteoApiClient(
+                client, latitude=55.59, longitude=-162.26, params=params
+            )
+            await gismeteo.async_get_location()
+            assert get_data.call_count == 1
+
+            # Nearby point is resolved without request
+            gismeteo = GismeteoApiClient(
+                client, latitude=55.6, longitude=-162.25, params=params
+            )
+            await gismeteo.async_get_location()
+            assert get_data.call_count == 1
+
+    assert gismeteo.attributes[ATTR_ID] == 167413
+    assert gismeteo.latitude == 55.5914
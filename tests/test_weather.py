@@ -1,13 +1,18 @@
 """Tests for GisMeteo integration."""
-from unittest.mock import Mock
+from datetime import timedelta
+from unittest.mock import Mock, patch
 
 from pytest_homeassistant_custom_component.common import assert_setup_component
 
-from custom_components.gismeteo import GismeteoDataUpdateCoordinator
-from custom_components.gismeteo.const import DOMAIN
-from custom_components.gismeteo.weather import GismeteoWeather
+from custom_components.gismeteo import (
+    GismeteoDataUpdateCoordinator,
+    async_get_yaml_collected,
+)
+from custom_components.gismeteo.const import CONF_YAML, DOMAIN, WEATHER
+from custom_components.gismeteo.weather import GismeteoWeather, async_setup_platform
+from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN
 from homeassistant.components.weather import DOMAIN as WEATHER_DOMAIN
-from homeassistant.const import CONF_NAME, CONF_PLATFORM
+from homeassistant.const import CONF_MONITORED_CONDITIONS, CONF_NAME, CONF_PLATFORM
 from homeassistant.core import HomeAssistant
 from homeassistant.setup import async_setup_component
 
@@ -42,3 +47,27 @@ async def test_async_setup_platform(hass: HomeAssistant, gismeteo_api):
     state = hass.states.get(f"{WEATHER_DOMAIN}.office")
     assert state is not None
     assert state.state == "snowy"
+
+
+async def test_late_platform_setup(hass: HomeAssistant, gismeteo_api):
+    """Test setup of location registered after locations were set up."""
+    with patch("custom_components.gismeteo.YAML_QUIET_PERIOD", timedelta(0)):
+        config = {
+            SENSOR_DOMAIN: {
+                CONF_PLATFORM: DOMAIN,
+                CONF_NAME: "Office",
+                CONF_MONITORED_CONDITIONS: ["condition"],
+            },
+        }
+        assert await async_setup_component(hass, SENSOR_DOMAIN, config)
+        await hass.async_block_till_done()
+        assert async_get_yaml_collected(hass).is_set()
+
+        add_entities = Mock()
+        await async_setup_platform(hass, {CONF_NAME: "Home"}, add_entities)
+
+    assert hass.states.get(f"{SENSOR_DOMAIN}.office_condition") is not None
+    (entity,) = add_entities.call_args[0][0]
+    assert isinstance(entity, GismeteoWeather)
+    assert entity.coordinator.last_update_success
+    assert f"{WEATHER}Home" not in hass.data[DOMAIN][CONF_YAML]